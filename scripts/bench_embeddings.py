@@ -0,0 +1,100 @@
+# scripts/bench_embeddings.py
+"""
+嵌入后端基准：对比 torch、ONNX fp32 和 ONNX int8 的加载时间、单条查询延迟、批量吞吐和与 torch 的余弦一致性。
+ONNX 模型需先用 scripts/export_onnx.py 导出；缺失的后端会被跳过。
+
+用法:
+    python scripts/bench_embeddings.py [--threads 4] [--repeat 200] [--batch-size 32] [--output bench_embeddings.json]
+"""
+import argparse
+import csv
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 将 src/ 目录加入模块搜索路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+import config
+from embeddings import EmbeddingService
+from indexing import discover_manuals
+from onnx_embeddings import parity_check
+from utils import iter_docs_from_markdown
+
+def load_questions() -> list[str]:
+    csv_path = Path(__file__).parent.parent / "data" / "test-questions.csv"
+    with open(csv_path, encoding="utf-8") as f:
+        return [row["Question"] for row in csv.DictReader(f)]
+
+def load_chunks(limit: int) -> list[str]:
+    chunks = []
+    for path in discover_manuals(config.DATA_DIR):
+        chunks += [doc.page_content for doc in iter_docs_from_markdown(str(path))]
+    return chunks[:limit]
+
+def bench_backend(service: EmbeddingService, questions: list[str], chunks: list[str], repeat: int) -> dict:
+    # 先跑一次，排除首次调用的初始化开销
+    service.embed_documents(chunks[:service.batch_size])
+    latencies = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        # 关闭了查询缓存，每次都真正编码
+        service.embed_query(questions[i % len(questions)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    service.embed_documents(chunks)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "chunks_per_second": len(chunks) / elapsed if elapsed > 0 else 0.0,
+        "model_bytes": service.stats()["model_param_bytes"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads per backend (0 = default)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=config.EMBED_BATCH_SIZE)
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    questions = load_questions()
+    chunks = load_chunks(args.chunks)
+    backends = [
+        ("torch", dict(model_path=config.EMBED_MODEL_PATH, backend="torch")),
+        ("onnx_fp32", dict(model_path=config.EMBED_ONNX_PATH, backend="onnx", quantized=False)),
+        ("onnx_int8", dict(model_path=config.EMBED_ONNX_PATH, backend="onnx", quantized=True)),
+    ]
+
+    results = {}
+    reference = None
+    for name, kwargs in backends:
+        start = time.perf_counter()
+        try:
+            service = EmbeddingService(batch_size=args.batch_size, num_threads=args.threads, query_cache_size=0, **kwargs)
+        except Exception as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            continue
+        result = {"load_seconds": time.perf_counter() - start}
+        result.update(bench_backend(service, questions, chunks, args.repeat))
+        if name == "torch":
+            reference = service
+        elif reference is not None:
+            result["parity"] = parity_check(reference, service, questions + chunks[:64])
+        results[name] = result
+        print(f"{name:>10}: load {result['load_seconds']:.2f}s, query p50 {result['query_p50_ms']:.2f} ms, "
+              f"{result['chunks_per_second']:.1f} chunks/s, {result['model_bytes'] / 1024 / 1024:.1f} MiB"
+              + (f", min cosine {result['parity']['min_cosine']:.4f}" if "parity" in result else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"threads": args.threads, "batch_size": args.batch_size, "results": results}, f, indent=2)
+        print(f"📝 Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# scripts/bench_routing.py
+"""
+路由引擎微基准：对 data/test-questions.csv 中的问题及其合成变体反复路由，报告每次路由耗时。
+
+用法:
+    python scripts/bench_routing.py [--repeat 2000]
+"""
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+
+# 将 src/ 目录加入模块搜索路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+from routing import Router, SERIES_ALIASES, INTENT_KEYWORDS, route
+
+def load_questions() -> list[str]:
+    csv_path = Path(__file__).parent.parent / "data" / "test-questions.csv"
+    with open(csv_path, encoding="utf-8") as f:
+        questions = [row["Question"] for row in csv.DictReader(f)]
+    # 合成变体：大小写、标点和冗长前缀
+    variants = []
+    for q in questions:
+        variants += [q.upper(), q.lower().rstrip("?"), "Hello, I have a question about our fleet. " + q]
+    return questions + variants
+
+def bench(fn, questions: list[str], repeat: int) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in questions:
+            fn(q)
+    return (time.perf_counter() - start) / (repeat * len(questions)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing engine microbenchmark")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    questions = load_questions()
+    print(f"{len(questions)} questions x {args.repeat} repeats")
+    print(f"default table ({len(SERIES_ALIASES)} series): {bench(route, questions, args.repeat):.2f} µs/route")
+
+    # 模拟产品线扩展到 50 个系列时的耗时
+    large_table = dict(SERIES_ALIASES)
+    for i in range(47):
+        model = 900 + i * 10
+        large_table[f"X{model}"] = [f"ecu-{model}", str(model), f"ecu-{model}x", f"{model}x"]
+    large_router = Router(large_table, INTENT_KEYWORDS)
+    print(f"large table ({len(large_table)} series): {bench(large_router.route, questions, args.repeat):.2f} µs/route")
+
+if __name__ == "__main__":
+    main()
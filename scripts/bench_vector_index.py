@@ -0,0 +1,85 @@
+# scripts/bench_vector_index.py
+"""
+向量检索微基准：在随机归一化向量上比较 NumPy 索引各存储精度的检索耗时、常驻内存、
+单次查询的临时内存峰值（tracemalloc）和召回一致性。
+传入 --chroma 时额外对比已构建的 Chroma 系列索引。
+
+用法:
+    python scripts/bench_vector_index.py [--chunks 2000] [--dim 384] [--repeat 2000] [--chroma]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+
+# 将 src/ 目录加入模块搜索路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+from vector_index import NumpyVectorIndex, DTYPES
+
+def random_unit_vectors(n: int, dim: int, rng) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def bench(fn, queries, repeat: int) -> float:
+    """返回每次查询的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(queries[i % len(queries)])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def peak_query_bytes(index, query, k: int) -> int:
+    """单次查询期间新分配内存的峰值"""
+    tracemalloc.start()
+    index.similarity_search_by_vector_with_relevance_scores(query, k=k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def top_ids(index, query, k):
+    return [doc.metadata["id"] for doc, _ in index.similarity_search_by_vector_with_relevance_scores(query, k=k)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector index microbenchmark")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--chroma", action="store_true", help="also benchmark the built Chroma indexes")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = random_unit_vectors(args.chunks, args.dim, rng)
+    queries = random_unit_vectors(64, args.dim, rng)
+    texts = [f"chunk {i}" for i in range(args.chunks)]
+    metadatas = [{"id": i, "series": ("700", "800B", "800P")[i % 3]} for i in range(args.chunks)]
+
+    print(f"{args.chunks} chunks x {args.dim} dims, k={args.k}")
+    reference = NumpyVectorIndex(texts, metadatas, vectors, "float32")
+    for dtype in DTYPES:
+        index = reference if dtype == "float32" else NumpyVectorIndex(texts, metadatas, vectors, dtype)
+        latency = bench(lambda q: index.similarity_search_by_vector_with_relevance_scores(q, k=args.k),
+                        queries, args.repeat)
+        filtered = bench(lambda q: index.similarity_search_by_vector_with_relevance_scores(
+            q, k=args.k, filter={"series": "800B"}), queries, args.repeat)
+        # 以 float32 的结果为基准，统计量化后 top-k 的重合率
+        overlap = np.mean([
+            len(set(top_ids(index, q, args.k)) & set(top_ids(reference, q, args.k))) / args.k for q in queries
+        ])
+        transient = peak_query_bytes(index, queries[0], args.k)
+        print(f"{dtype:>8}: {latency:8.1f} µs/query, {filtered:8.1f} µs/query (series filter), "
+              f"{index.nbytes / args.chunks:6.0f} B/chunk, {transient / 1024:7.1f} KiB transient/query, "
+              f"top-{args.k} overlap {overlap:.3f}")
+
+    if args.chroma:
+        from rag import SERIES, open_index
+        for series in SERIES:
+            vectorstore = open_index(series)
+            latency = bench(lambda q: vectorstore.similarity_search_by_vector_with_relevance_scores(
+                q.tolist(), k=args.k), queries, min(args.repeat, 200))
+            print(f"chroma {series:>5}: {latency:8.1f} µs/query")
+
+if __name__ == "__main__":
+    main()
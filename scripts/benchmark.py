@@ -0,0 +1,220 @@
+# scripts/benchmark.py
+"""
+分阶段基准测试
+
+对 data/test-questions.csv 中的问题及其合成变体分别测量 route / retrieve / generate 节点
+和完整 query_ecu_agent 的延迟（p50/p95/p99），不同并发度下的吞吐量，以及峰值 RSS。
+默认关闭回答缓存，测到的是路由、检索和生成本身；--with-cache 时每个阶段开始前清空缓存。
+每个阶段的规格表 / 缓存命中次数一并写入结果，便于判断数字测的是哪条路径。
+结果写入 JSON，可选记录为 MLflow 指标以便对比不同版本。
+
+用法:
+    ECU_GENERATOR_BACKEND=fake python scripts/benchmark.py --concurrency 1,4,16 --output bench.json [--mlflow]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+# 将 src/ 目录加入模块搜索路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+import config
+import agent
+from answer_cache import answer_cache
+from metrics import FAST_PATH_ANSWERS
+
+def load_questions(variants: bool = True) -> list[str]:
+    csv_path = Path(__file__).parent.parent / "data" / "test-questions.csv"
+    with open(csv_path, encoding="utf-8") as f:
+        questions = [row["Question"] for row in csv.DictReader(f)]
+    if not variants:
+        return questions
+    # 合成变体：改写措辞，避免全部命中同一个缓存键
+    synthetic = []
+    for q in questions:
+        synthetic += [
+            q.lower().rstrip("?") + "?",
+            "Quick question: " + q,
+            q.replace("ECU-", "ECU ") + " Please be brief."
+        ]
+    return questions + synthetic
+
+def percentiles(samples_ms: list[float]) -> dict:
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+
+    def _pct(p):
+        # 线性插值
+        pos = (len(ordered) - 1) * p
+        lo = int(pos)
+        hi = min(lo + 1, len(ordered) - 1)
+        return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered),
+        "p50_ms": _pct(0.50),
+        "p95_ms": _pct(0.95),
+        "p99_ms": _pct(0.99),
+        "max_ms": ordered[-1]
+    }
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if platform.system() == "Darwin" else rss / 1024
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def fast_path_counts() -> dict:
+    return {source: FAST_PATH_ANSWERS.get(source=source) for source in ("spec", "cache")}
+
+def run_phase(fn, *args):
+    """运行一个测量阶段：先清空回答缓存，返回 (结果, 本阶段的规格表 / 缓存命中次数)"""
+    answer_cache.clear()
+    before = fast_path_counts()
+    result = fn(*args)
+    after = fast_path_counts()
+    return result, {f"{source}_hits": after[source] - before[source] for source in after}
+
+def bench_stages(questions: list[str], repeat: int) -> dict:
+    """逐个问题依次运行 route → retrieve → generate 节点，再运行完整的 query_ecu_agent"""
+    samples = {"route": [], "retrieve": [], "generate": [], "full": []}
+    for _ in range(repeat):
+        for q in questions:
+            state = agent._initial_state(q)
+            update, ms = _timed(agent.route_question, state)
+            state.update(update)
+            samples["route"].append(ms)
+            update, ms = _timed(agent.retrieve_documents, state)
+            state.update(update)
+            samples["retrieve"].append(ms)
+            _, ms = _timed(agent.generate_answer, state)
+            samples["generate"].append(ms)
+            _, ms = _timed(agent.query_ecu_agent, q)
+            samples["full"].append(ms)
+    return {stage: percentiles(values) for stage, values in samples.items()}
+
+async def _bench_concurrency(questions: list[str], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def _one(q):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await agent.aquery_ecu_agent(q)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(q) for q in questions))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "errors": errors,
+        "throughput_qps": len(questions) / elapsed if elapsed > 0 else 0.0,
+        "latency": percentiles(latencies)
+    }
+
+def bench_throughput(questions: list[str], levels: list[int]) -> list[dict]:
+    return [asyncio.run(_bench_concurrency(questions, level)) for level in levels]
+
+def log_to_mlflow(report: dict, run_name: str):
+    import mlflow
+    metrics = {}
+    for stage, stats in report["stages"].items():
+        for name in ("p50_ms", "p95_ms", "p99_ms"):
+            if name in stats:
+                metrics[f"{stage}_{name}"] = stats[name]
+    for level in report["throughput"]:
+        metrics[f"qps_c{level['concurrency']}"] = level["throughput_qps"]
+        metrics[f"full_p99_ms_c{level['concurrency']}"] = level["latency"].get("p99_ms", 0.0)
+    for phase, hits in report["fast_path_hits"].items():
+        for name, value in hits.items():
+            metrics[f"{phase}_{name}"] = value
+    if report["peak_rss_mb"] is not None:
+        metrics["peak_rss_mb"] = report["peak_rss_mb"]
+    with mlflow.start_run(run_name=run_name):
+        mlflow.log_params(report["config"])
+        mlflow.log_metrics(metrics)
+        mlflow.log_dict(report, "benchmark.json")
+
+def main():
+    parser = argparse.ArgumentParser(description="ECU agent per-stage benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the question set for per-stage timing")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--no-variants", action="store_true", help="only use the questions from the CSV")
+    parser.add_argument("--with-cache", action="store_true",
+                        help="keep the answer cache enabled (cleared before each phase)")
+    parser.add_argument("--disable-spec", action="store_true", help="disable the spec-table fast path")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--mlflow", action="store_true", help="also log metrics to MLflow")
+    parser.add_argument("--run-name", default="ecu-benchmark")
+    args = parser.parse_args()
+
+    # 同一组问题会被反复执行，开着缓存时测到的多是缓存命中
+    config.ANSWER_CACHE_ENABLED = args.with_cache
+    if args.disable_spec:
+        config.SPEC_FASTPATH_ENABLED = False
+
+    questions = load_questions(variants=not args.no_variants)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    print(f"🚀 Benchmarking {len(questions)} questions (backend={config.GENERATOR_BACKEND})")
+
+    warmup = agent.warmup_ecu_agent()
+    stages, stage_hits = run_phase(bench_stages, questions, args.repeat)
+    throughput, throughput_hits = run_phase(bench_throughput, questions, levels)
+    report = {
+        "config": {
+            "generator_backend": config.GENERATOR_BACKEND,
+            "index_mode": config.INDEX_MODE,
+            "answer_cache": config.ANSWER_CACHE_ENABLED,
+            "spec_fastpath": config.SPEC_FASTPATH_ENABLED,
+            "questions": len(questions),
+            "repeat": args.repeat
+        },
+        "warmup_seconds": {name: step["seconds"] for name, step in warmup.items()},
+        "stages": stages,
+        "throughput": throughput,
+        "fast_path_hits": {"stages": stage_hits, "throughput": throughput_hits},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+    for stage, stats in report["stages"].items():
+        print(f"  {stage:<9} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+    for level in report["throughput"]:
+        print(f"  c={level['concurrency']:<3} {level['throughput_qps']:.2f} q/s, p99={level['latency']['p99_ms']:.2f}ms, errors={level['errors']}")
+    for phase, hits in report["fast_path_hits"].items():
+        print(f"  {phase} fast path: {hits['spec_hits']:.0f} spec hits, {hits['cache_hits']:.0f} cache hits")
+    print(f"  peak RSS: {report['peak_rss_mb']} MB")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📝 Results written to {args.output}")
+    if args.mlflow:
+        log_to_mlflow(report, args.run_name)
+        print("📈 Metrics logged to MLflow")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# scripts/export_onnx.py
+"""
+导出 ONNX 嵌入模型并做一致性检查
+
+把本地 bge 模型导出为 ONNX（默认同时生成 int8 量化版本），然后在测试问题和手册 chunk 上
+与 torch 后端对比余弦一致性；任一模型的最小余弦低于阈值时返回非零退出码。
+
+用法:
+    python scripts/export_onnx.py [--output models/bge-small-en-v1.5-onnx] [--no-quantize] [--min-cosine 0.99]
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+# 将 src/ 目录加入模块搜索路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+import config
+from embeddings import EmbeddingService
+from indexing import discover_manuals
+from onnx_embeddings import OnnxEmbeddings, export_onnx, parity_check
+from utils import iter_docs_from_markdown
+
+def load_texts(max_chunks: int) -> list[str]:
+    """测试问题 + 手册 chunk，覆盖短查询和长文档两种输入"""
+    csv_path = Path(__file__).parent.parent / "data" / "test-questions.csv"
+    with open(csv_path, encoding="utf-8") as f:
+        texts = [row["Question"] for row in csv.DictReader(f)]
+    chunks = []
+    for path in discover_manuals(config.DATA_DIR):
+        chunks += [doc.page_content for doc in iter_docs_from_markdown(str(path))]
+    return texts + chunks[:max_chunks]
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX and check parity with torch")
+    parser.add_argument("--model-path", default=str(config.EMBED_MODEL_PATH))
+    parser.add_argument("--output", default=str(config.EMBED_ONNX_PATH))
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 model")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="fail if any text falls below this cosine")
+    parser.add_argument("--max-chunks", type=int, default=200)
+    args = parser.parse_args()
+
+    sizes = export_onnx(args.model_path, args.output, quantize=not args.no_quantize)
+    for name, size in sizes.items():
+        print(f"✅ {name}: {size / 1024 / 1024:.1f} MiB")
+
+    texts = load_texts(args.max_chunks)
+    reference = EmbeddingService(args.model_path, backend="torch", query_cache_size=0)
+    report = {}
+    for quantized in ([False] if args.no_quantize else [False, True]):
+        name = "onnx_int8" if quantized else "onnx_fp32"
+        report[name] = parity_check(reference, OnnxEmbeddings(args.output, quantized=quantized), texts)
+    print(json.dumps(report, indent=2))
+
+    failed = [name for name, result in report.items() if result["min_cosine"] < args.min_cosine]
+    if failed:
+        print(f"❌ Parity below {args.min_cosine}: {failed}")
+        return 1
+    print(f"✅ All ONNX models agree with torch (min cosine >= {args.min_cosine})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# scripts/profile_startup.py
+"""
+启动耗时分析
+
+1. 在子进程中用 python -X importtime 导入 api 模块，按顶层包汇总导入耗时；
+2. 在本进程中计时 import api，再逐个初始化组件（图、规格索引、嵌入模型、各系列索引、
+   BM25 索引、LLM 客户端，可选 LLM 预热请求），报告每个组件的耗时。
+
+用法:
+    python scripts/profile_startup.py [--top 15] [--ping-llm] [--output startup.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# 将 src/ 目录加入模块搜索路径
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+def profile_imports(module: str) -> dict:
+    """
+    解析 -X importtime 的输出（stderr 中每行 "import time: self | cumulative | name"），
+    返回 {"packages": {顶层包: 自身耗时秒}, "modules": {本项目模块: 累计耗时秒}, "total": 秒}
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=src_path, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    local = {p.stem for p in src_path.glob("*.py")}
+    packages, modules = {}, {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0.0) + int(self_us) / 1e6
+        if top in local and top == name:
+            modules[top] = int(cumulative_us) / 1e6
+        if top == module:
+            total = int(cumulative_us) / 1e6
+    return {"total": total, "packages": packages, "modules": modules}
+
+def _print_table(title: str, rows: dict, top: int):
+    print(title)
+    for name, seconds in sorted(rows.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {name:<28} {seconds * 1000:9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup import/initialization profiler")
+    parser.add_argument("--module", default="api", help="module whose import is profiled")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--ping-llm", action="store_true", help="also send one warm-up request to the LLM")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    imports = profile_imports(args.module)
+    print(f"📦 import {args.module}: {imports['total'] * 1000:.1f} ms (fresh interpreter, -X importtime)")
+    _print_table("Top-level packages (self time):", imports["packages"], args.top)
+    _print_table("Project modules (cumulative):", imports["modules"], args.top)
+
+    start = time.perf_counter()
+    __import__(args.module)
+    import_seconds = time.perf_counter() - start
+    from agent import warmup_ecu_agent
+    report = warmup_ecu_agent(warmup_llm=args.ping_llm)
+    print(f"⏱️ import {args.module} in-process: {import_seconds * 1000:.1f} ms")
+    print("Components (first initialization):")
+    for name, step in report.items():
+        status = "ok" if step["ok"] else f"FAILED: {step['error']}"
+        print(f"  {name:<28} {step['seconds'] * 1000:9.1f} ms  {status}")
+    total = import_seconds + sum(step["seconds"] for step in report.values())
+    print(f"✅ Ready after {total:.2f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "imports": imports,
+                "import_seconds": import_seconds,
+                "components": report,
+                "total_seconds": total
+            }, f, indent=2)
+        print(f"📝 Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
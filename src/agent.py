@@ -1,12 +1,18 @@
 from typing import TypedDict, List, Literal
 from langchain_core.documents import Document
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langgraph.graph import StateGraph, END
-import mlflow
+import asyncio
 import time
-from rag import get_vectorstore
+import threading
+import config
+from rag import (get_vectorstore, get_unified_vectorstore, get_index_version, get_lexical_index, retrieve,
+                 retrieve_batch, SERIES, UNIFIED_INDEX)
+from embeddings import get_embedding_service
+from answer_cache import answer_cache
+from routing import route
+from spec_index import get_spec_index, format_answer
+from context import pack_context, count_tokens
+from tracking import log_interaction
+from metrics import STAGE_LATENCY, ROUTING_DECISIONS, RETRIEVAL_ERRORS, LLM_TOKENS, FAST_PATH_ANSWERS, instrument_stage
 
 # 设置本地 MLflow 跟踪 URI（默认就是 ./mlruns，可省略）
 # mlflow.set_tracking_uri("./mlruns")  # 可选，显式指定
@@ -21,203 +27,194 @@ class ECUAgentState(TypedDict):
     series_to_query: Literal["700", "800b", "800p", "unknown"]  # 路由决策
     retrieved_docs: List[Document]              # 检索到的文档
     final_answer: str                           # 最终回答
+    cache_hit: bool                             # 回答是否来自缓存
+    spec_hit: bool                              # 回答是否直接来自规格表
+    retrieval_errors: dict                      # 检索失败或超时的系列 {系列: 错误信息}
+    query_vector: list | None                   # 已算好的问题向量（批处理路径），缓存读写据此跳过重复嵌入
 
 # ======================
 # 2. 初始化 LLM（全局复用）
 # ======================
-llm = ChatOllama(
-    model="llama3.1:8b",
-    base_url="http://localhost:11434",
-    temperature=0.0,
-    num_predict=256,
-    timeout=120
-)
+# 后端由 config.GENERATOR_BACKEND 选择（ollama / openai / fake）
+# 首次使用（或启动预热）时才创建，导入本模块时不加载 LLM 客户端库
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from generators import create_llm
+                _llm = create_llm()
+    return _llm
 
 # ======================
 # 3. 定义节点函数
 # ======================
 def route_question(state: ECUAgentState) -> dict:
-    """根据问题内容决定查询哪个 ECU 系列"""
-    q = state["user_question"].lower()
-    user_question = state["user_question"]  # 保持原始大小写用于显示
+    """根据问题内容决定查询哪个 ECU 系列（规则见 routing.SERIES_ALIASES / INTENT_KEYWORDS）"""
+    user_question = state["user_question"]
     print(f"🔍 Analyzing question: '{user_question}'")
-
-    # 检测问题中涉及的型号
-    has_700 = any(kw in q for kw in ["700", "750", "legacy"])
-    has_800P = any(kw in q for kw in ["800b", "800b?", "850b", "ECU-850b?"])
-    has_800B = any(kw in q for kw in ["800 ", "base", "800 base", "850 ","850?" "ECU-850"])
-    # 统计匹配的系列数
-    series_count = sum([has_700, has_800B, has_800P])
-
-    # 检测比较意图的关键字
-    comparison_keywords = [
-        "compare", "comparison", "difference", "vs", "versus", "between", 
-        "vs.", "comparing", "contrast", "differences", "vs ", " versus ", "and"
-    ]
-    is_comparison = any(keyword in q for keyword in comparison_keywords)
-    # 检测通用查询（涉及多个型号）
-    general_keywords = [
-        "which ", "all ", "models", "How many", "est "
-    ]
-    is_general = any(keyword in q for keyword in general_keywords)
-
-    # 处理比较问题
-    if is_comparison and series_count >= 2:
-        # 确定涉及哪些系列
-        multi_series = []
-        if has_700:
-            multi_series.append("700")
-        if has_800B:
-            multi_series.append("800B")
-        if has_800P:
-            multi_series.append("800P")
-        result = f"multi:{','.join(multi_series)}"
-        print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (comparison detected)")
-        return {"series_to_query": result}
-
-    # 处理通用查询（需要跨多个系列查找）
-    if is_general:
-        # 检查问题中是否明确指定了型号范围
-        if series_count > 0:
-            multi_series = []
-            if has_700:
-                multi_series.append("700")
-            if has_800B:
-                multi_series.append("800B")
-            if has_800P:
-                multi_series.append("800P")
-            if len(multi_series) > 1:
-                result = f"multi:{','.join(multi_series)}"
-                print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (general query across series)")
-                return {"series_to_query": result}
-            if len(multi_series) == 1:
-                result = multi_series[0]
-                matched_kw = [kw for kw in ["700", "850 ", "850b", "750"] if kw in q.lower()][0]
-                print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (matched: {matched_kw})")
-                return {"series_to_query": result}
-        else:
-            # 通用查询但未指定具体型号，查询所有系列
-            result = "multi:700,800B,800P"
-            print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (general query across ALL series)")
-            return {"series_to_query": result}
-
+    result, reason = route(user_question)
+    print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' ({reason})")
+    ROUTING_DECISIONS.inc(route=result)
+    return {"series_to_query": result}
+
+def lookup_spec_answer(state: ECUAgentState) -> dict:
+    """单一型号 + 单一参数的规格问题直接查表作答，跳过向量检索和 LLM"""
+    if not config.SPEC_FASTPATH_ENABLED or state["series_to_query"].startswith("multi:"):
+        return {"spec_hit": False}
+    entry = get_spec_index().lookup(state["user_question"])
+    if entry is None:
+        return {"spec_hit": False}
+    print(f"📋 Spec table hit: {entry['model']} / {entry['parameter']}")
+    FAST_PATH_ANSWERS.inc(source="spec")
+    return {"spec_hit": True, "final_answer": format_answer(entry)}
+
+def _query_vector(state: ECUAgentState):
+    """优先使用状态中已算好的问题向量；否则嵌入问题（结果进入嵌入服务的 LRU 缓存，检索阶段直接复用）"""
+    if state.get("query_vector") is not None:
+        return state["query_vector"]
+    return get_embedding_service().embed_query(state["user_question"])
+
+def lookup_cached_answer(state: ECUAgentState) -> dict:
+    """在检索和生成之前查找语义回答缓存"""
+    if not config.ANSWER_CACHE_ENABLED:
+        return {"cache_hit": False}
+    embedder = get_embedding_service()
+    question = state["user_question"]
+    answer = answer_cache.get(embedder.normalize(question), state["series_to_query"],
+                              _query_vector(state), get_index_version())
+    if answer is None:
+        return {"cache_hit": False}
+    print(f"⚡ Answer cache hit for: '{question}'")
+    FAST_PATH_ANSWERS.inc(source="cache")
+    return {"cache_hit": True, "final_answer": answer}
+
+def store_cached_answer(state: ECUAgentState) -> dict:
+    """把新生成的回答写入缓存（没有检索到文档、或有系列检索失败导致回答不完整时不缓存）"""
+    if state.get("retrieval_errors"):
+        print(f"⚠️ Not caching answer built from partial retrieval: {list(state['retrieval_errors'])}")
+        return {}
+    if config.ANSWER_CACHE_ENABLED and state["retrieved_docs"] and not state.get("cache_hit"):
+        embedder = get_embedding_service()
+        question = state["user_question"]
+        answer_cache.put(embedder.normalize(question), state["series_to_query"],
+                         _query_vector(state), state["final_answer"], get_index_version())
+    return {}
+
+def series_list_for(series_to_query: str) -> list[str]:
+    """把路由结果转换为要检索的系列列表"""
+    if series_to_query == "unknown":
+        # 从所有系列中检索（用于通用查询）
+        return list(SERIES)
+    if series_to_query.startswith("multi:"):
+        # 解析多个系列
+        return series_to_query[6:].split(",")  # "multi:800B,800P" -> ["800B", "800P"]
     # 单一系列查询
-    if has_700:
-        result = "700"
-        matched_kw = [kw for kw in ["700", "750", "legacy"] if kw in q][0]
-        print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (matched: {matched_kw})")
-        return {"series_to_query": result}
-    if has_800B:
-        result = "800B"
-        # 找到匹配的关键词
-        matched_kws = [kw for kw in ["800 ", "base", "800 base", "850", "ecu-850 "] if kw in q]
-        matched_kw = matched_kws[0] if matched_kws else "850"
-        print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (matched: {matched_kw})")
-        return {"series_to_query": result}
-    if has_800P:
-        result = "800P"
-        matched_kws = [kw for kw in ["800p", "800 p", "plus", "800 plus", "850b", "ecu-850b "] if kw in q]
-        matched_kw = matched_kws[0] if matched_kws else "850b"
-        print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (matched: {matched_kw})")
-        return {"series_to_query": result}
-    else:
-        result = "unknown"
-        print(f"🎯 Route: '{user_question}' -> series_to_query: '{result}' (no match found)")
-        return {"series_to_query": result}
+    return [series_to_query]
 
 def retrieve_documents(state: ECUAgentState) -> dict:
     """从本地 ChromaDB 检索相关文档"""
     series = state["series_to_query"]
-    all_docs=[]
+    # 每个请求只嵌入一次问题，所有系列复用同一个向量
+    try:
+        query_vector = get_embedding_service().embed_query(state["user_question"])
+    except Exception as e:
+        print(f"⚠️ Query embedding failed: {e}")
+        return {"retrieved_docs": [], "retrieval_errors": {"embedding": str(e)}}
+
+    series_list = series_list_for(series)
     if series == "unknown":
-        # 从所有系列中检索（用于通用查询）
         print("🔄 Unknown series detected - retrieving from ALL series")
-        try:
-            for s in ["700", "800B", "800P"]:
-                print(f"  ➤ Retrieving from series {s}...")
-                vectorstore = get_vectorstore(s)
-                docs = vectorstore.similarity_search(
-                    state["user_question"],
-                    k=2  # 从每个系列取2个最相关的 chunks
-                )
-                # 添加系列标签到元数据，便于后续区分
-                for doc in docs:
-                    doc.metadata["series"] = s
-                all_docs.extend(docs)
-                print(f"    Retrieved {len(docs)} docs from series {s}")
-        except Exception as e:
-            print(f"⚠️ Universal retrieval failed: {e}")
-            return {"retrieved_docs": []}
-
-    # 检查是否为多系列查询格式
     elif series.startswith("multi:"):
-        # 解析多个系列
-        series_list = series[6:].split(",")  # "multi:800B,800P" -> ["800B", "800P"]
         print(f"🔄 Multi-series retrieval: {series_list}")
 
-        try:
-            for s in series_list:
-                print(f"  ➤ multi: Retrieving from series {s}...")
-                vectorstore = get_vectorstore(s)
-                docs = vectorstore.similarity_search(
-                    state["user_question"],
-                    k=2  # 每个系列取 3 个最相关的 chunks
-                )
-                # 添加系列标签到元数据，便于后续区分
-                for doc in docs:
-                    doc.metadata["series"] = s
-                all_docs.extend(docs)
-                print(f" Retrieved {len(docs)} docs from series {s}")
-        except Exception as e:
-            print(f"⚠️ Multi-retrieval failed: {e}")
-            return {"retrieved_docs": []}
-
-    else:
-        # 单一系列查询（原逻辑）
-        try:
-            vectorstore = get_vectorstore(series)
-            docs = vectorstore.similarity_search(
-                state["user_question"],
-                k=2
-            )
-            # 为单一系列也添加系列标签
-            for doc in docs:
-                doc.metadata["series"] = series
-            all_docs = docs
-        except Exception as e:
-            print(f"⚠️ Single-retrieval failed for series {series}: {e}")
-            return {"retrieved_docs": []}
+    # 各系列并发检索（每个系列取 2 个最相关的 chunks，开启混合检索时与 BM25 融合），单个系列失败不影响其他系列
+    all_docs, errors = retrieve(series_list, state["user_question"], query_vector, k=2)
+    for s, error in errors.items():
+        print(f"⚠️ Retrieval failed for series {s}: {error}")
+        RETRIEVAL_ERRORS.inc(series=s)
 
     print(f"✅ Retrieved {len(all_docs)} documents from {len(set(d.metadata.get('series') for d in all_docs))} series")
-    return {"retrieved_docs": all_docs}
+    return {"retrieved_docs": all_docs, "retrieval_errors": errors}
 
-def generate_answer(state: ECUAgentState) -> dict:
-    """基于检索结果生成最终回答"""
-    question = state["user_question"]
-    docs = state["retrieved_docs"]
+NO_DOCS_ANSWER = "I don't have technical information about this ECU model."
 
-    if not docs:
-        answer = "I don't have technical information about this ECU model."
-    else:
-        context = docs[0].page_content
+# prompt 和生成链只构建一次（首次生成时）
+ANSWER_TEMPLATE = """You are an expert automotive engineer assistant.
+    Answer the question based ONLY on the following context.
+    Do not make up information. If unsure, say "I don't know".
 
-        prompt = ChatPromptTemplate.from_template(
-            """You are an expert automotive engineer assistant.
-            Answer the question based ONLY on the following context.
-            Do not make up information. If unsure, say "I don't know".
+    Context:
+    {context}
 
-            Context:
-            {context}
+    Question: {question}
+    Answer:"""
 
-            Question: {question}
-            Answer:"""
-        )
+_answer_chain = None
+_answer_chain_lock = threading.Lock()
+
+def get_answer_chain():
+    global _answer_chain
+    if _answer_chain is None:
+        with _answer_chain_lock:
+            if _answer_chain is None:
+                from langchain_core.prompts import ChatPromptTemplate
+                from langchain_core.output_parsers import StrOutputParser
+                _answer_chain = ChatPromptTemplate.from_template(ANSWER_TEMPLATE) | get_llm() | StrOutputParser()
+    return _answer_chain
+
+def _prompt_inputs(state: ECUAgentState) -> dict:
+    context, _ = pack_context(state["retrieved_docs"])
+    inputs = {"context": context, "question": state["user_question"]}
+    LLM_TOKENS.inc(count_tokens(ANSWER_TEMPLATE.format(**inputs)), kind="prompt")
+    return inputs
+
+def _record_completion(answer: str, seconds: float):
+    STAGE_LATENCY.observe(seconds, stage="llm", series="")
+    LLM_TOKENS.inc(count_tokens(answer), kind="completion")
+
+def generate_answer(state: ECUAgentState) -> dict:
+    """基于检索结果生成最终回答"""
+    if not state["retrieved_docs"]:
+        return {"final_answer": NO_DOCS_ANSWER}
 
-        chain = prompt | llm | StrOutputParser()
-        answer = chain.invoke({"context": context, "question": question})
+    inputs = _prompt_inputs(state)
+    start = time.perf_counter()
+    answer = get_answer_chain().invoke(inputs)
+    _record_completion(answer, time.perf_counter() - start)
+    return {"final_answer": answer}
 
+# ----------------------
+# 异步版本节点：供 ainvoke 使用，不阻塞事件循环
+# ----------------------
+async def aretrieve_documents(state: ECUAgentState) -> dict:
+    """异步检索：嵌入和 Chroma 查询是同步 CPU/IO 操作，放到线程池中执行"""
+    return await asyncio.to_thread(retrieve_documents, state)
+
+async def agenerate_answer(state: ECUAgentState) -> dict:
+    """异步生成：通过生成后端的异步接口调用"""
+    if not state["retrieved_docs"]:
+        return {"final_answer": NO_DOCS_ANSWER}
+
+    inputs = _prompt_inputs(state)
+    start = time.perf_counter()
+    answer = await get_answer_chain().ainvoke(inputs)
+    _record_completion(answer, time.perf_counter() - start)
     return {"final_answer": answer}
 
+# 带耗时记录的节点（ecu_stage_latency_seconds）：图、流式和批量路径共用，各条路径的流量都计入
+_route_node = instrument_stage("route", route_question)
+_spec_lookup_node = instrument_stage("spec_lookup", lookup_spec_answer)
+_cache_lookup_node = instrument_stage("cache_lookup", lookup_cached_answer)
+_retrieve_node = instrument_stage("retrieve", retrieve_documents)
+_aretrieve_node = instrument_stage("retrieve", aretrieve_documents)
+_generate_node = instrument_stage("generate", generate_answer)
+_agenerate_node = instrument_stage("generate", agenerate_answer)
+_cache_store_node = instrument_stage("cache_store", store_cached_answer)
+
 # ======================
 # 4. 构建并返回 LangGraph Agent
 # ======================
@@ -228,111 +225,332 @@ def build_ecu_agent():
     返回:
         Runnable: 可通过 .invoke({"user_question": "..."}) 调用的 Agent
     """
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(ECUAgentState)
 
-    # 添加节点
-    workflow.add_node("route", route_question)
-    workflow.add_node("retrieve", retrieve_documents)
-    workflow.add_node("generate", generate_answer)
+    # 添加节点（每个节点的耗时记录在 ecu_stage_latency_seconds 中）
+    workflow.add_node("route", _route_node)
+    workflow.add_node("spec_lookup", _spec_lookup_node)
+    workflow.add_node("cache_lookup", _cache_lookup_node)
+    # 同时提供同步和异步实现，同一个编译好的图可用于 invoke 和 ainvoke
+    workflow.add_node("retrieve", RunnableLambda(_retrieve_node, afunc=_aretrieve_node))
+    workflow.add_node("generate", RunnableLambda(_generate_node, afunc=_agenerate_node))
+    workflow.add_node("cache_store", _cache_store_node)
 
-    # 设置入口和边
+    # 设置入口和边：规格表或缓存命中时跳过检索和生成
     workflow.set_entry_point("route")
-    workflow.add_edge("route", "retrieve")
+    workflow.add_edge("route", "spec_lookup")
+    workflow.add_conditional_edges(
+        "spec_lookup",
+        lambda state: "hit" if state["spec_hit"] else "miss",
+        {"hit": END, "miss": "cache_lookup"}
+    )
+    workflow.add_conditional_edges(
+        "cache_lookup",
+        lambda state: "hit" if state["cache_hit"] else "miss",
+        {"hit": END, "miss": "retrieve"}
+    )
     workflow.add_edge("retrieve", "generate")
-    workflow.add_edge("generate", END)
+    workflow.add_edge("generate", "cache_store")
+    workflow.add_edge("cache_store", END)
 
     # 编译为可执行应用
     app = workflow.compile()
     return app
 
-# 便捷回复
-def query_ecu_agent(question: str) -> str:
-    """便捷函数：输入问题，返回答案"""
-    app = build_ecu_agent()
-    result = app.invoke({
+# 进程内只编译一次的 Agent
+_compiled_agent = None
+_agent_lock = threading.Lock()
+
+def get_ecu_agent():
+    """返回进程内共享的已编译 Agent，首次调用时编译"""
+    global _compiled_agent
+    if _compiled_agent is None:
+        with _agent_lock:
+            if _compiled_agent is None:
+                _compiled_agent = build_ecu_agent()
+    return _compiled_agent
+
+def warmup_ecu_agent(warmup_llm: bool = True, warmup_indexes: bool = True,
+                     warmup_llm_client: bool | None = None) -> dict:
+    """
+    预热整条流水线：编译图、加载所有系列索引和嵌入模型，并分别发送一次预热请求。
+    fork 前在父进程预加载时跳过 LLM，必要时也跳过索引（不能跨 fork 共享的连接留给 worker 自己建立）。
+
+    参数:
+        warmup_llm: 是否向 LLM 发送一次预热请求
+        warmup_llm_client: 是否构建 LLM 客户端（含 httpx 连接池），默认与 warmup_llm 相同；
+            fork 前必须跳过，worker 可以只构建客户端而不请求后端
+
+    返回:
+        dict: 每个组件的 {"ok": bool, "seconds": float, "error": str | None}
+    """
+    report = {}
+
+    def _step(name, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+            report[name] = {"ok": True, "seconds": time.perf_counter() - start, "error": None}
+        except Exception as e:
+            report[name] = {"ok": False, "seconds": time.perf_counter() - start, "error": str(e)}
+            print(f"⚠️ Warm-up step '{name}' failed: {e}")
+
+    _step("graph", get_ecu_agent)
+    _step("spec_index", get_spec_index)
+    _step("embedder", lambda: get_embedding_service().embed_query("ECU warm-up query"))
+    # tiktoken 首次使用时可能需要下载 BPE 文件，不能留到事件循环上的第一次生成
+    _step("tokenizer", lambda: count_tokens("ECU warm-up query"))
+    if warmup_indexes:
+        if config.INDEX_MODE == UNIFIED_INDEX:
+            _step("vectorstore_unified", get_unified_vectorstore)
+        else:
+            for s in SERIES:
+                _step(f"vectorstore_{s}", lambda s=s: get_vectorstore(s))
+        if config.HYBRID_RETRIEVAL:
+            _step("lexical_index", get_lexical_index)
+    if warmup_llm if warmup_llm_client is None else warmup_llm_client:
+        _step("llm_client", get_answer_chain)
+    if warmup_llm:
+        _step("llm", lambda: get_llm().invoke("ping"))
+    return report
+
+def _initial_state(question: str) -> ECUAgentState:
+    return {
         "user_question": question,
         "series_to_query": "unknown",
         "retrieved_docs": [],
-        "final_answer": ""
-    })
-    return result["final_answer"]
-
-# # ----------------------------
-# # 5. Orchestrator (with MLflow) test
-# # ----------------------------
-# def run_ecu_agent_with_mlflow(user_question: str) -> dict:
-#     """完整执行流程 + MLflow 日志"""
-
-#     # 定义默认返回值
-#     final_state = {
-#         "user_question": user_question,
-#         "series_to_query": "unknown",
-#         "retrieved_docs": [],
-#         "final_answer": "处理中...",
-#         "success": False,
-#         "error": None
-#     }
-
-#     try:
-#         with mlflow.start_run(run_name=f"Q: {user_question[:40]}..."):
-#             # 记录开始时间
-#             start_time = time.time()
-
-#             # 记录参数
-#             mlflow.log_param("question", user_question)
-#             mlflow.log_param("question_length", len(user_question))
-
-#             # 构建代理
-#             app = build_ecu_agent()
-
-#             # 准备初始状态
-#             initial_state = {
-#                 "user_question": user_question,
-#                 "series_to_query": "unknown",
-#                 "retrieved_docs": [],
-#                 "final_answer": ""
-#             }
-
-#             # 执行代理
-#             agent_result = app.invoke(initial_state)  # 使用不同的变量名
-
-#             # 更新 final_state
-#             final_state.update(agent_result)
-#             final_state["success"] = True
-
-#             # 计算执行时间
-#             execution_time = time.time() - start_time
-#             final_state["execution_time"] = execution_time
-
-#             # 记录指标
-#             mlflow.log_metric("execution_time", execution_time)
-#             mlflow.log_metric("docs_retrieved", len(final_state.get("retrieved_docs", [])))
-#             mlflow.log_metric("answer_length", len(final_state.get("final_answer", "")))
-
-#             # 记录模型输入输出
-#             mlflow.log_dict({
-#                 "input": initial_state,
-#                 "output": final_state
-#             }, "input_output.json")
-
-#             # 记录最终状态
-#             mlflow.log_dict(final_state, "final_state.json")
-
-#     except Exception as error:
-#         # 错误处理
-#         final_state.update({
-#             "success": False,
-#             "error": str(error),
-#             "final_answer": f"抱歉，处理问题时出错: {error}"
-#         })
-
-#         # 记录错误
-#         if 'mlflow' in locals():
-#             mlflow.log_param("error", str(error))
-#             mlflow.log_metric("error_occurred", 1)
-
-#     # 确保总是返回 final_state
-#     return final_state
+        "final_answer": "",
+        "cache_hit": False,
+        "spec_hit": False,
+        "retrieval_errors": {},
+        "query_vector": None
+    }
+
+# 便捷回复（每次交互都放入后台 MLflow 日志队列，不阻塞请求）
+def query_ecu_agent(question: str) -> str:
+    """便捷函数：输入问题，返回答案"""
+    app = get_ecu_agent()
+    state = _initial_state(question)
+    start = time.perf_counter()
+    try:
+        state = app.invoke(state)
+    except Exception as e:
+        log_interaction(question, state, (time.perf_counter() - start) * 1000, error=str(e))
+        raise
+    log_interaction(question, state, (time.perf_counter() - start) * 1000)
+    return state["final_answer"]
+
+async def aquery_ecu_agent(question: str) -> str:
+    """异步便捷函数：整条流水线不阻塞事件循环"""
+    app = get_ecu_agent()
+    state = _initial_state(question)
+    start = time.perf_counter()
+    try:
+        state = await app.ainvoke(state)
+    except Exception as e:
+        log_interaction(question, state, (time.perf_counter() - start) * 1000, error=str(e))
+        raise
+    log_interaction(question, state, (time.perf_counter() - start) * 1000)
+    return state["final_answer"]
+
+def _doc_source(doc: Document) -> dict:
+    """检索结果的来源信息（不含正文）"""
+    return {
+        "series": doc.metadata.get("series"),
+        "model": doc.metadata.get("model"),
+        "parameter": doc.metadata.get("parameter"),
+        "source": doc.metadata.get("source")
+    }
+
+async def astream_ecu_agent(question: str):
+    """
+    流式问答：依次产出事件 dict {"event": ..., "data": ...}
+
+    - "meta": 路由结果与检索到的来源
+    - "token": LLM 生成的文本片段
+    - "done": 各阶段耗时统计
+    """
+    start = time.perf_counter()
+    state = _initial_state(question)
+
+    state.update(_route_node(state))
+    state.update(_spec_lookup_node(state))
+    if not state["spec_hit"]:
+        state.update(await asyncio.to_thread(_cache_lookup_node, state))
+    answered = state["spec_hit"] or state["cache_hit"]
+    route_done = time.perf_counter()
+    if not answered:
+        state.update(await _aretrieve_node(state))
+    retrieve_done = time.perf_counter()
+
+    docs = state["retrieved_docs"]
+    yield {"event": "meta", "data": {
+        "series_to_query": state["series_to_query"],
+        "spec_hit": state["spec_hit"],
+        "cache_hit": state["cache_hit"],
+        "sources": [_doc_source(d) for d in docs]
+    }}
+
+    first_token = None
+    chunks = 0
+    if answered or not docs:
+        first_token = time.perf_counter()
+        chunks = 1
+        yield {"event": "token", "data": {"text": state["final_answer"] if answered else NO_DOCS_ANSWER}}
+    else:
+        inputs = _prompt_inputs(state)
+        llm_start = time.perf_counter()
+        parts = []
+        async for text in get_answer_chain().astream(inputs):
+            if not text:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter()
+            chunks += 1
+            parts.append(text)
+            yield {"event": "token", "data": {"text": text}}
+        state["final_answer"] = "".join(parts)
+        _record_completion(state["final_answer"], time.perf_counter() - llm_start)
+        STAGE_LATENCY.observe(time.perf_counter() - llm_start, stage="generate", series="")
+        await asyncio.to_thread(_cache_store_node, state)
+
+    end = time.perf_counter()
+    log_interaction(question, state, (end - start) * 1000)
+    yield {"event": "done", "data": {
+        "route_ms": (route_done - start) * 1000,
+        "retrieve_ms": (retrieve_done - route_done) * 1000,
+        "time_to_first_token_ms": ((first_token or end) - start) * 1000,
+        "generate_ms": (end - retrieve_done) * 1000,
+        "total_ms": (end - start) * 1000,
+        "chunks": chunks
+    }}
+
+async def aquery_ecu_agent_batch(questions: list[str], concurrency: int | None = None) -> dict:
+    """
+    批量问答：面向吞吐量的批处理。
+
+    - 相同问题（规范化后）只处理一次
+    - 规格表能直接回答的问题不做嵌入；其余问题在一次批量前向中完成嵌入
+    - 按路由结果分组，每组每个系列只检索一次
+    - LLM 生成按 concurrency 限制并发（不超过 config.BATCH_GENERATION_CONCURRENCY）
+
+    返回:
+        dict: {"results": [...与 questions 一一对应...], "unique_questions": int, "timings": {...}}
+    """
+    # 调用方只能调低并发，不能绕过 LLM 后端的并发上限
+    concurrency = min(concurrency or config.BATCH_GENERATION_CONCURRENCY, config.BATCH_GENERATION_CONCURRENCY)
+    embedder = get_embedding_service()
+    start = time.perf_counter()
+
+    # 1. 去重（保持首次出现的顺序）
+    keys = [embedder.normalize(q) for q in questions]
+    unique = {}
+    for key, q in zip(keys, questions):
+        unique.setdefault(key, q)
+    unique_keys = list(unique)
+    states = {key: _initial_state(unique[key]) for key in unique_keys}
+
+    # 2. 路由
+    for state in states.values():
+        state.update(_route_node(state))
+    route_done = time.perf_counter()
+
+    # 3. 规格表直接作答的问题跳过嵌入、检索和生成
+    for state in states.values():
+        state.update(_spec_lookup_node(state))
+    to_embed = [key for key in unique_keys if not states[key]["spec_hit"]]
+
+    # 4. 其余问题一次批量嵌入，向量存入状态，回答缓存读写不再逐个嵌入
+    vectors = dict(zip(to_embed, await asyncio.to_thread(embedder.embed_queries, [unique[k] for k in to_embed])))
+    for key, vector in vectors.items():
+        states[key]["query_vector"] = vector
+    embed_done = time.perf_counter()
+
+    # 命中回答缓存的问题跳过检索和生成
+    for key in to_embed:
+        states[key].update(_cache_lookup_node(states[key]))
+    pending = [key for key in unique_keys if not (states[key]["spec_hit"] or states[key]["cache_hit"])]
+
+    # 5. 按路由结果分组检索
+    groups = {}
+    for key in pending:
+        groups.setdefault(states[key]["series_to_query"], []).append(key)
+    for series_route, group_keys in groups.items():
+        group_start = time.perf_counter()
+        docs_per_question, errors = await asyncio.to_thread(
+            retrieve_batch, series_list_for(series_route), [states[k]["user_question"] for k in group_keys],
+            [vectors[k] for k in group_keys], 2
+        )
+        # 同组问题一起检索，每个问题的检索耗时即整组耗时
+        for _ in group_keys:
+            STAGE_LATENCY.observe(time.perf_counter() - group_start, stage="retrieve", series="")
+        for s, error in errors.items():
+            print(f"⚠️ Batch retrieval failed for series {s}: {error}")
+            RETRIEVAL_ERRORS.inc(series=s)
+        for key, docs in zip(group_keys, docs_per_question):
+            states[key]["retrieved_docs"] = docs
+            states[key]["retrieval_errors"] = errors
+    retrieve_done = time.perf_counter()
+
+    # 6. 有界并发生成
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {}
+
+    async def _generate(key):
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                states[key].update(await _agenerate_node(states[key]))
+                _cache_store_node(states[key])
+                answer, error = states[key]["final_answer"], None
+            except Exception as e:
+                answer, error = "", str(e)
+            outcomes[key] = (answer, error, (time.perf_counter() - t0) * 1000)
+
+    for key in unique_keys:
+        if states[key]["spec_hit"] or states[key]["cache_hit"]:
+            outcomes[key] = (states[key]["final_answer"], None, 0.0)
+    await asyncio.gather(*(_generate(key) for key in pending))
+    end = time.perf_counter()
+
+    results = []
+    seen = set()
+    for key, q in zip(keys, questions):
+        answer, error, generate_ms = outcomes[key]
+        state = states[key]
+        results.append({
+            "question": q,
+            "answer": answer,
+            "series_to_query": state["series_to_query"],
+            "sources": [_doc_source(d) for d in state["retrieved_docs"]],
+            "error": error,
+            "spec_hit": state["spec_hit"],
+            "cache_hit": state["cache_hit"],
+            "duplicate": key in seen,
+            "timings": {"generate_ms": generate_ms}
+        })
+        if key not in seen:
+            log_interaction(q, state, (route_done - start) * 1000 + generate_ms, error=error)
+        seen.add(key)
+
+    return {
+        "results": results,
+        "unique_questions": len(unique_keys),
+        "timings": {
+            "route_ms": (route_done - start) * 1000,
+            "embed_ms": (embed_done - route_done) * 1000,
+            "retrieve_ms": (retrieve_done - embed_done) * 1000,
+            "generate_ms": (end - retrieve_done) * 1000,
+            "total_ms": (end - start) * 1000
+        }
+    }
+
+def query_ecu_agent_batch(questions: list[str], concurrency: int | None = None) -> dict:
+    """同步便捷函数：批量问答（见 aquery_ecu_agent_batch）"""
+    return asyncio.run(aquery_ecu_agent_batch(questions, concurrency))
 
 ###################################################
 # def build_ecu_agent_HF():
@@ -0,0 +1,139 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import config
+from metrics import REGISTRY, CACHE_HIT_RATE, CACHE_ENTRIES
+
+class AnswerCache:
+    """
+    LangGraph Agent 前面的语义回答缓存。
+
+    - 精确命中：键为 (规范化问题, 路由结果)
+    - 近似命中：同一路由结果下，问题向量的余弦相似度 >= similarity_threshold
+    - LRU + TTL 淘汰，并限制总条数和估算内存
+    - 索引版本变化时整体失效
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()   # (key, route) -> entry dict
+        self._matrices = {}             # route -> (keys, 向量矩阵)，按需重建
+        self._bytes = 0
+        self._index_version = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry_size(key: str, answer: str, vector: np.ndarray) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(answer) + vector.nbytes
+
+    def _check_version(self, index_version):
+        # 调用方持有锁
+        if index_version != self._index_version:
+            self._entries.clear()
+            self._matrices.clear()
+            self._bytes = 0
+            self._index_version = index_version
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return self.ttl > 0 and now - entry["created"] > self.ttl
+
+    def _remove(self, cache_key):
+        entry = self._entries.pop(cache_key)
+        self._bytes -= entry["size"]
+        self._matrices.pop(cache_key[1], None)
+
+    def get(self, key: str, route: str, vector, index_version=None) -> str | None:
+        """按精确键、再按语义相似度查找缓存的回答"""
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(index_version)
+            cache_key = (key, route)
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(cache_key)
+                    self.exact_hits += 1
+                    return entry["answer"]
+                self._remove(cache_key)
+
+            if vector is not None and self.similarity_threshold < 1.0:
+                match = self._nearest(route, np.asarray(vector, dtype=np.float32), now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match]["answer"]
+
+            self.misses += 1
+            return None
+
+    def _nearest(self, route: str, vector: np.ndarray, now: float):
+        # 调用方持有锁；向量已归一化，点积即余弦相似度
+        if route not in self._matrices:
+            keys = [k for k in self._entries if k[1] == route]
+            if not keys:
+                return None
+            self._matrices[route] = (keys, np.stack([self._entries[k]["vector"] for k in keys]))
+        keys, matrix = self._matrices[route]
+        scores = matrix @ vector
+        for i in np.argsort(-scores):
+            if scores[i] < self.similarity_threshold:
+                return None
+            if self._expired(self._entries[keys[i]], now):
+                continue
+            return keys[i]
+        return None
+
+    def put(self, key: str, route: str, vector, answer: str, index_version=None):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._check_version(index_version)
+            cache_key = (key, route)
+            if cache_key in self._entries:
+                self._remove(cache_key)
+            size = self._entry_size(key, answer, vector)
+            self._entries[cache_key] = {"answer": answer, "vector": vector, "created": time.monotonic(), "size": size}
+            self._bytes += size
+            self._matrices.pop(route, None)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+            }
+
+answer_cache = AnswerCache(
+    max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=config.ANSWER_CACHE_MAX_BYTES,
+    ttl=config.ANSWER_CACHE_TTL,
+    similarity_threshold=config.ANSWER_CACHE_SIMILARITY
+)
+
+def _collect_metrics():
+    stats = answer_cache.stats()
+    CACHE_HIT_RATE.set(stats["hit_rate"], cache="answer")
+    CACHE_ENTRIES.set(stats["entries"], cache="answer")
+
+REGISTRY.add_callback(_collect_metrics)
@@ -1,32 +1,161 @@
 # api.py
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.routing import Match
+import asyncio
+import json
 import os
 import sys
 import logging
+import time
 
 # 添加项目根目录到 Python 路径（确保能导入 agent）
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # 导入你的 agent 函数
-from agent import query_ecu_agent
+from agent import aquery_ecu_agent, aquery_ecu_agent_batch, astream_ecu_agent, get_llm, warmup_ecu_agent
+from metrics import REGISTRY, IN_FLIGHT, HTTP_LATENCY
+from tracking import close_interaction_logger
+import config
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ecu-agent-api")
 
+async def _warm_up(app: FastAPI):
+    """
+    后台预热：服务先开始监听（/health 在此期间返回 503），失败的组件按退避间隔重试直到全部成功。
+    已成功的组件都有进程内缓存，重试时几乎没有开销。LLM 不计入就绪状态，由 /health 单独探测；
+    就绪后再向 LLM 发送一次预热请求，让后端提前加载模型（失败只记录日志）。
+    """
+    delay = config.WARMUP_RETRY_INTERVAL
+    while True:
+        logger.info("🔥 Warming up ECU agent...")
+        app.state.warmup = await asyncio.to_thread(warmup_ecu_agent, False, warmup_llm_client=True)
+        failed = [name for name, step in app.state.warmup.items() if not step["ok"]]
+        if not failed:
+            app.state.ready = True
+            logger.info("✅ ECU agent ready")
+            await _warm_up_llm()
+            return
+        logger.warning(f"⚠️ ECU agent warm-up incomplete, failed steps: {failed}; retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60.0)
+
+async def _warm_up_llm():
+    """向 LLM 发送一次预热请求，避免第一个 /ask 承担模型冷加载的延迟"""
+    start = time.perf_counter()
+    try:
+        await get_llm().ainvoke("ping")
+        logger.info(f"🔥 LLM warmed up in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        logger.warning(f"⚠️ LLM warm-up request failed: {e}")
+
+async def _llm_status(app: FastAPI) -> dict:
+    """LLM 后端可达性，结果缓存 LLM_PROBE_TTL 秒，避免每次健康检查都请求后端"""
+    status = app.state.llm_status
+    now = time.monotonic()
+    if status is None or now - status["checked_at"] > config.LLM_PROBE_TTL:
+        from generators import probe_backend
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(probe_backend)
+            reachable, error = True, None
+        except Exception as e:
+            reachable, error = False, str(e)
+        status = app.state.llm_status = {
+            "backend": config.GENERATOR_BACKEND,
+            "reachable": reachable,
+            "error": error,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "checked_at": now
+        }
+    return status
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时在后台编译 Agent 并预热所有组件，/health 据此报告就绪状态"""
+    app.state.ready = False
+    app.state.warmup = {}
+    app.state.llm_status = None
+    warmup_task = asyncio.create_task(_warm_up(app))
+    yield
+    warmup_task.cancel()
+    # 关闭时冲刷尚未写入 MLflow 的交互记录
+    await asyncio.to_thread(close_interaction_logger)
+
 app = FastAPI(
     title="ECU Technical Q&A Agent API",
     description="基于 LangGraph + RAG 的 ECU 技术问答服务",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
+def _route_template(scope) -> str:
+    """指标标签使用匹配到的路由模板，未匹配的路径（404、探测请求）归为一类，避免标签基数无限增长"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """记录进行中的请求数和请求耗时；流式响应在响应体发送完毕（或客户端断开）时才结束计时"""
+    path = _route_template(request.scope)
+    IN_FLIGHT.inc(path=path)
+    start = time.perf_counter()
+
+    def _finish(status: int):
+        IN_FLIGHT.dec(path=path)
+        HTTP_LATENCY.observe(time.perf_counter() - start, path=path, method=request.method, status=status)
+
+    try:
+        response = await call_next(request)
+    except Exception:
+        _finish(500)
+        raise
+
+    body = response.body_iterator
+
+    async def _tracked_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            _finish(response.status_code)
+
+    response.body_iterator = _tracked_body()
+    return response
+
 class QuestionRequest(BaseModel):
     question: str
 
 class AnswerResponse(BaseModel):
     answer: str
 
+class BatchQuestionRequest(BaseModel):
+    questions: list[str]
+    concurrency: int | None = None  # 同时进行的 LLM 生成数，默认且最多为 ECU_BATCH_GENERATION_CONCURRENCY
+
+class BatchAnswerItem(BaseModel):
+    question: str
+    answer: str
+    series_to_query: str
+    sources: list[dict]
+    error: str | None = None
+    spec_hit: bool = False
+    cache_hit: bool = False
+    duplicate: bool = False
+    timings: dict
+
+class BatchAnswerResponse(BaseModel):
+    results: list[BatchAnswerItem]
+    unique_questions: int
+    timings: dict
+
 @app.post("/ask", response_model=AnswerResponse)
 async def ask_question(request: QuestionRequest):
     """
@@ -37,14 +166,77 @@ async def ask_question(request: QuestionRequest):
     
     try:
         logger.info(f"📥 Received question: {request.question}")
-        answer = query_ecu_agent(request.question)
+        answer = await aquery_ecu_agent(request.question)
         logger.info("✅ Answer generated successfully")
         return AnswerResponse(answer=answer)
     except Exception as e:
         logger.error(f"❌ Error processing question: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Agent failed to generate answer: {str(e)}")
 
+@app.post("/ask/batch", response_model=BatchAnswerResponse)
+async def ask_questions_batch(request: BatchQuestionRequest):
+    """
+    批量提问：去重、批量嵌入、按系列分组检索、有界并发生成
+    """
+    if not request.questions or any(not q.strip() for q in request.questions):
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if request.concurrency is not None and request.concurrency < 1:
+        raise HTTPException(status_code=400, detail="Concurrency must be at least 1")
+
+    try:
+        logger.info(f"📥 Received batch of {len(request.questions)} questions")
+        result = await aquery_ecu_agent_batch(request.questions, request.concurrency)
+        logger.info(f"✅ Batch answered ({result['unique_questions']} unique questions)")
+        return BatchAnswerResponse(**result)
+    except Exception as e:
+        logger.error(f"❌ Error processing batch: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Agent failed to answer batch: {str(e)}")
+
+def _sse(event: str, data: dict) -> str:
+    """格式化为一条 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    以 Server-Sent Events 流式返回回答：meta（路由与来源）→ token → done（耗时统计）
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    async def event_stream():
+        logger.info(f"📥 Received streaming question: {request.question}")
+        try:
+            async for item in astream_ecu_agent(request.question):
+                yield _sse(item["event"], item["data"])
+            logger.info("✅ Streamed answer successfully")
+        except Exception as e:
+            logger.error(f"❌ Error streaming answer: {e}", exc_info=True)
+            yield _sse("error", {"detail": f"Agent failed to generate answer: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/health")
 async def health_check():
-    """健康检查"""
-    return {"status": "ok", "agent": "ready"}
\ No newline at end of file
+    """
+    健康检查：进程就绪（所有组件预热成功）时返回 200，否则 503。
+    LLM 可达性单独报告：LLM 暂时不可用时进程仍就绪（规格表和缓存仍可作答），status 为 "degraded"。
+    """
+    ready = getattr(app.state, "ready", False)
+    llm = await _llm_status(app)
+    body = {
+        "status": ("ok" if llm["reachable"] else "degraded") if ready else "unavailable",
+        "agent": "ready" if ready else "not_ready",
+        "components": getattr(app.state, "warmup", {}),
+        "llm": {k: v for k, v in llm.items() if k != "checked_at"}
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
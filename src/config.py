@@ -0,0 +1,98 @@
+"""
+ECU Agent 配置管理
+
+所有可调参数集中在这里，均可通过环境变量覆盖。
+"""
+import os
+from pathlib import Path
+
+# 项目目录
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = PROJECT_ROOT / "data"
+MODELS_DIR = PROJECT_ROOT / "models"
+CHROMA_DIR = PROJECT_ROOT / "chroma_db"
+
+# 嵌入模型
+EMBED_MODEL_PATH = Path(os.getenv("ECU_EMBED_MODEL_PATH", str(MODELS_DIR / "bge-small-en-v1.5")))
+EMBED_MODEL_ID = os.getenv("ECU_EMBED_MODEL_ID", EMBED_MODEL_PATH.name)  # 写入索引 manifest，变化时整库重建
+EMBED_BATCH_SIZE = int(os.getenv("ECU_EMBED_BATCH_SIZE", "32"))
+EMBED_NUM_THREADS = int(os.getenv("ECU_EMBED_NUM_THREADS", "0"))  # 0 表示使用 torch 默认值
+QUERY_CACHE_SIZE = int(os.getenv("ECU_QUERY_CACHE_SIZE", "1024"))  # 查询向量 LRU 缓存条数，0 表示关闭
+# 嵌入后端："torch"（sentence-transformers）或 "onnx"（ONNX Runtime，先运行 scripts/export_onnx.py 导出）
+EMBED_BACKEND = os.getenv("ECU_EMBED_BACKEND", "torch")
+EMBED_ONNX_PATH = Path(os.getenv("ECU_EMBED_ONNX_PATH", str(MODELS_DIR / "bge-small-en-v1.5-onnx")))
+EMBED_ONNX_QUANTIZED = os.getenv("ECU_EMBED_ONNX_QUANTIZED", "1") == "1"  # 使用 int8 量化模型
+
+# 多系列并发检索
+RETRIEVAL_MAX_WORKERS = int(os.getenv("ECU_RETRIEVAL_MAX_WORKERS", "8"))
+RETRIEVAL_TIMEOUT = float(os.getenv("ECU_RETRIEVAL_TIMEOUT", "10"))  # 每个系列的超时（秒）
+
+# 索引模式："per_series" 每个系列一个 Chroma 集合；"unified" 所有系列一个集合，按 series 元数据过滤
+INDEX_MODE = os.getenv("ECU_INDEX_MODE", "per_series")
+UNIFIED_OVERFETCH = int(os.getenv("ECU_UNIFIED_OVERFETCH", "3"))  # unified 多系列查询时候选数的倍数，取回后每个系列保留 k 个
+INDEX_RELOAD_CHECK_INTERVAL = float(os.getenv("ECU_INDEX_RELOAD_CHECK_INTERVAL", "5"))  # 检查离线重建的间隔（秒），0 = 不检查，重建后需重启
+# 服务进程默认只加载离线构建好的索引（python src/index_cli.py build）；设为 1 时允许在加载时构建/增量更新
+INDEX_AUTO_BUILD = os.getenv("ECU_INDEX_AUTO_BUILD", "0") == "1"
+INDEX_BATCH_SIZE = int(os.getenv("ECU_INDEX_BATCH_SIZE", "256"))  # 建索引时每批嵌入的 chunk 数
+# 检索后端："chroma" 直接查询 Chroma；"numpy" 启动时把向量载入进程内的 NumPy 矩阵
+VECTOR_BACKEND = os.getenv("ECU_VECTOR_BACKEND", "chroma")
+VECTOR_DTYPE = os.getenv("ECU_VECTOR_DTYPE", "float16")  # numpy 后端的存储精度：float32 / float16 / int8
+
+# 批量问答时同时进行的 LLM 生成数
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("ECU_BATCH_GENERATION_CONCURRENCY", "4"))
+
+# 语义回答缓存
+ANSWER_CACHE_ENABLED = os.getenv("ECU_ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ECU_ANSWER_CACHE_MAX_ENTRIES", "2048"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ECU_ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+ANSWER_CACHE_TTL = float(os.getenv("ECU_ANSWER_CACHE_TTL", "3600"))  # 秒，0 表示不过期
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ECU_ANSWER_CACHE_SIMILARITY", "0.95"))  # 近似命中的余弦相似度阈值
+
+# 规格表精确查询快速通道（命中时跳过向量检索和 LLM）
+SPEC_FASTPATH_ENABLED = os.getenv("ECU_SPEC_FASTPATH_ENABLED", "1") == "1"
+SPEC_INDEX_PATH = Path(os.getenv("ECU_SPEC_INDEX_PATH", str(CHROMA_DIR / "spec_index.json")))
+
+# 生成时上下文的 token 预算（用 tiktoken 计数）
+CONTEXT_TOKEN_BUDGET = int(os.getenv("ECU_CONTEXT_TOKEN_BUDGET", "768"))
+CONTEXT_ENCODING = os.getenv("ECU_CONTEXT_ENCODING", "cl100k_base")
+
+# 生成后端："ollama" | "openai"（任意 OpenAI 兼容的本地服务）| "fake"（确定性假模型，用于压测）
+GENERATOR_BACKEND = os.getenv("ECU_GENERATOR_BACKEND", "ollama")
+LLM_MODEL = os.getenv("ECU_LLM_MODEL", "llama3.1:8b")
+LLM_TEMPERATURE = float(os.getenv("ECU_LLM_TEMPERATURE", "0.0"))
+LLM_MAX_TOKENS = int(os.getenv("ECU_LLM_MAX_TOKENS", "256"))
+LLM_TIMEOUT = float(os.getenv("ECU_LLM_TIMEOUT", "120"))
+OLLAMA_BASE_URL = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OPENAI_BASE_URL = os.getenv("ECU_OPENAI_BASE_URL", "http://localhost:8001/v1")
+OPENAI_API_KEY = os.getenv("ECU_OPENAI_API_KEY", "not-needed")
+FAKE_LLM_LATENCY = float(os.getenv("ECU_FAKE_LLM_LATENCY", "0.05"))  # 首个 token 前的延迟（秒）
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("ECU_FAKE_LLM_TOKENS_PER_SECOND", "50"))  # 0 表示不限速
+FAKE_LLM_TOKENS = int(os.getenv("ECU_FAKE_LLM_TOKENS", "32"))
+
+# 健康检查：预热失败的组件按间隔重试（指数退避，上限 60 秒）；LLM 可达性按 TTL 重新探测
+WARMUP_RETRY_INTERVAL = float(os.getenv("ECU_WARMUP_RETRY_INTERVAL", "5"))
+LLM_PROBE_TTL = float(os.getenv("ECU_LLM_PROBE_TTL", "10"))
+LLM_PROBE_TIMEOUT = float(os.getenv("ECU_LLM_PROBE_TIMEOUT", "2"))
+
+# 后台 MLflow 交互日志
+TRACKING_ENABLED = os.getenv("ECU_TRACKING_ENABLED", "1") == "1"
+TRACKING_EXPERIMENT = os.getenv("ECU_TRACKING_EXPERIMENT", "ECU-agent-interactions")
+TRACKING_QUEUE_SIZE = int(os.getenv("ECU_TRACKING_QUEUE_SIZE", "10000"))
+TRACKING_BATCH_SIZE = int(os.getenv("ECU_TRACKING_BATCH_SIZE", "200"))
+TRACKING_FLUSH_INTERVAL = float(os.getenv("ECU_TRACKING_FLUSH_INTERVAL", "5"))  # 秒
+TRACKING_POLICY = os.getenv("ECU_TRACKING_POLICY", "drop")  # 队列满时："drop" 丢弃新记录；"sample" 半满后按比例采样
+TRACKING_SAMPLE_RATE = float(os.getenv("ECU_TRACKING_SAMPLE_RATE", "0.1"))
+
+# 混合检索：BM25 词法检索 + 稠密检索，用 reciprocal-rank fusion 融合
+HYBRID_RETRIEVAL = os.getenv("ECU_HYBRID_RETRIEVAL", "1") == "1"
+HYBRID_CANDIDATES = int(os.getenv("ECU_HYBRID_CANDIDATES", "8"))  # 每个系列每路检索的候选数
+RRF_K = int(os.getenv("ECU_RRF_K", "60"))
+
+# 多 worker 服务（python src/serve.py）：父进程预加载后 fork，worker 以写时复制方式共享内存
+SERVE_HOST = os.getenv("ECU_SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("ECU_SERVE_PORT", "8000"))
+SERVE_WORKERS = int(os.getenv("ECU_SERVE_WORKERS", "1"))
+SERVE_MAX_RESTARTS = int(os.getenv("ECU_SERVE_MAX_RESTARTS", "5"))  # 每个 worker 槽位连续崩溃后的最大重启次数，超过后服务以非 0 退出
+SERVE_RESTART_BACKOFF = float(os.getenv("ECU_SERVE_RESTART_BACKOFF", "1"))  # 重启退避的初始间隔（秒），每次翻倍，最多 60 秒
+SERVE_RESTART_RESET = float(os.getenv("ECU_SERVE_RESTART_RESET", "60"))  # worker 运行超过该秒数后退出不计入连续崩溃
+WORKER_THREADS = int(os.getenv("ECU_WORKER_THREADS", "0"))  # 每个 worker 的嵌入推理线程数，0 表示可用 CPU 数 / worker 数
@@ -0,0 +1,98 @@
+"""
+生成前的上下文组装
+
+对检索结果去重，按相关度和系列交错排序，并在 token 预算内尽可能多地打包 chunk，
+使 prompt 长度（也就是 LLM 的 prefill 耗时）可预测、有上界。
+"""
+import hashlib
+import threading
+import config
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(config.CONTEXT_ENCODING)
+                except Exception as e:
+                    # 离线环境可能无法下载 BPE 文件，退化为按字符估算
+                    print(f"⚠️ tiktoken encoding unavailable ({e}); estimating 4 chars per token")
+                    _encoding = False
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+    return text[:max_tokens * 4]
+
+def dedupe(docs: list) -> list:
+    """按正文去重，保留第一次出现（相关度最高）的 chunk"""
+    seen = set()
+    unique = []
+    for doc in docs:
+        digest = hashlib.sha1(doc.page_content.encode("utf-8")).digest()
+        if digest not in seen:
+            seen.add(digest)
+            unique.append(doc)
+    return unique
+
+def _rank_key(doc) -> float:
+    if "rrf_score" in doc.metadata:
+        return -doc.metadata["rrf_score"]
+    return doc.metadata.get("distance", float("inf"))
+
+def order_by_score_and_series(docs: list) -> list:
+    """
+    每个系列内部按得分排序（有 RRF 融合分时按其降序，否则按距离升序），
+    系列之间轮流取（每轮内也按得分排序），保证比较类问题的每个系列都能进入上下文。
+    """
+    by_series = {}
+    for doc in docs:
+        by_series.setdefault(doc.metadata.get("series"), []).append(doc)
+    queues = [sorted(group, key=_rank_key) for group in by_series.values()]
+    ordered = []
+    for rank in range(max((len(q) for q in queues), default=0)):
+        round_docs = [q[rank] for q in queues if rank < len(q)]
+        ordered += sorted(round_docs, key=_rank_key)
+    return ordered
+
+def pack_context(docs: list, budget: int | None = None) -> tuple[str, dict]:
+    """
+    在 token 预算内组装上下文。
+
+    返回:
+        (context, stats): stats 含 chunks_in / chunks_packed / tokens / budget
+    """
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    candidates = order_by_score_and_series(dedupe(docs))
+    separator_tokens = count_tokens(CHUNK_SEPARATOR)
+    packed = []
+    used = 0
+    for doc in candidates:
+        cost = count_tokens(doc.page_content) + (separator_tokens if packed else 0)
+        if used + cost > budget:
+            continue  # 放不下就跳过，继续尝试更短的 chunk
+        packed.append(doc.page_content)
+        used += cost
+    if not packed and candidates:
+        # 单个 chunk 就超出预算时截断最相关的一个，保证总有上下文
+        packed.append(_truncate(candidates[0].page_content, budget))
+        used = count_tokens(packed[0])
+
+    stats = {"chunks_in": len(docs), "chunks_packed": len(packed), "tokens": used, "budget": budget}
+    print(f"📦 Context: packed {stats['chunks_packed']}/{stats['chunks_in']} chunks, {used}/{budget} tokens")
+    return CHUNK_SEPARATOR.join(packed), stats
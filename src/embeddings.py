@@ -0,0 +1,189 @@
+import threading
+from collections import OrderedDict
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+from langchain_core.embeddings import Embeddings
+import config
+from metrics import REGISTRY, STAGE_LATENCY, CACHE_HIT_RATE, CACHE_ENTRIES
+
+class EmbeddingService(Embeddings):
+    """
+    进程内共享的嵌入服务，所有向量库和工具共用同一份 bge 模型。
+
+    - backend 为 "torch"（HuggingFaceEmbeddings）或 "onnx"（OnnxEmbeddings，不导入 torch）
+    - embed_documents 按 batch_size 分批编码
+    - num_threads > 0 时设置 torch / ONNX Runtime 的 intra-op 线程数
+    - embed_query 带 LRU 缓存，键为规范化后的问题文本
+    - stats() 返回内存占用、批大小与缓存命中统计
+    """
+
+    def __init__(self, model_path: str, batch_size: int = 32, num_threads: int = 0, query_cache_size: int = 1024,
+                 backend: str = "torch", quantized: bool = True):
+        self.model_path = str(model_path)
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.backend = backend
+        if backend == "onnx":
+            from onnx_embeddings import OnnxEmbeddings
+            self._model = OnnxEmbeddings(self.model_path, quantized=quantized,
+                                         batch_size=batch_size, num_threads=num_threads)
+        elif backend == "torch":
+            if num_threads > 0:
+                import torch
+                torch.set_num_threads(num_threads)
+            from langchain_huggingface import HuggingFaceEmbeddings
+            self._model = HuggingFaceEmbeddings(
+                model_name=self.model_path,
+                model_kwargs={"device": "cpu"},
+                encode_kwargs={"normalize_embeddings": True, "batch_size": batch_size}
+            )
+        else:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected 'torch' or 'onnx'")
+        self._lock = threading.Lock()
+        self._texts = 0
+        self._batches = 0
+        self._queries = 0
+        self._max_batch = 0
+        self._query_cache = OrderedDict()
+        self._query_cache_size = query_cache_size
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _record_batch(self, size: int):
+        with self._lock:
+            self._texts += size
+            self._batches += 1
+            self._max_batch = max(self._max_batch, size)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            with STAGE_LATENCY.time(stage="embed_batch", series=""):
+                vectors.extend(self._model.embed_documents(batch))
+            self._record_batch(len(batch))
+        return vectors
+
+    def set_num_threads(self, num_threads: int):
+        """调整 intra-op 线程数（多 worker 服务时每个 worker 分到一部分核）"""
+        if self.backend == "onnx":
+            self._model.set_num_threads(num_threads)
+        else:
+            import torch
+            torch.set_num_threads(num_threads)
+        self.num_threads = num_threads
+
+    def set_batch_size(self, batch_size: int):
+        """调整批大小（离线建索引时使用更大的批）"""
+        self.batch_size = batch_size
+        if self.backend == "onnx":
+            self._model.batch_size = batch_size
+        else:
+            self._model.encode_kwargs["batch_size"] = batch_size
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """规范化问题文本：小写并合并空白（bge 的分词器本身不区分大小写）"""
+        return " ".join(text.lower().split())
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self.normalize(text)
+        with self._lock:
+            self._queries += 1
+            if key in self._query_cache:
+                self._cache_hits += 1
+                self._query_cache.move_to_end(key)
+                return self._query_cache[key]
+            self._cache_misses += 1
+        with STAGE_LATENCY.time(stage="embed_query", series=""):
+            vector = self._model.embed_query(key)
+        if self._query_cache_size > 0:
+            with self._lock:
+                self._query_cache[key] = vector
+                self._query_cache.move_to_end(key)
+                while len(self._query_cache) > self._query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """批量嵌入多个问题：命中缓存的直接返回，其余在一次批量前向中计算"""
+        keys = [self.normalize(t) for t in texts]
+        vectors = {}
+        with self._lock:
+            self._queries += len(keys)
+            for key in keys:
+                if key in self._query_cache:
+                    self._cache_hits += 1
+                    self._query_cache.move_to_end(key)
+                    vectors[key] = self._query_cache[key]
+            misses = list(dict.fromkeys(k for k in keys if k not in vectors))
+            self._cache_misses += len(misses)
+        if misses:
+            for key, vector in zip(misses, self.embed_documents(misses)):
+                vectors[key] = vector
+            if self._query_cache_size > 0:
+                with self._lock:
+                    for key in misses:
+                        self._query_cache[key] = vectors[key]
+                        self._query_cache.move_to_end(key)
+                    while len(self._query_cache) > self._query_cache_size:
+                        self._query_cache.popitem(last=False)
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> dict:
+        """嵌入调用计数、批大小和内存占用"""
+        param_bytes = 0
+        if self.backend == "onnx":
+            param_bytes = self._model.model_bytes
+        elif getattr(self._model, "_client", None) is not None:
+            param_bytes = sum(p.numel() * p.element_size() for p in self._model._client.parameters())
+        with self._lock:
+            return {
+                "model": self.model_path,
+                "backend": self.backend,
+                "queries": self._queries,
+                "documents": self._texts,
+                "batches": self._batches,
+                "avg_batch_size": self._texts / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "query_cache_size": len(self._query_cache),
+                "query_cache_hits": self._cache_hits,
+                "query_cache_misses": self._cache_misses,
+                "model_param_bytes": param_bytes,
+                # Linux 上 ru_maxrss 单位为 KB
+                "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None
+            }
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_embedding_service() -> EmbeddingService:
+    """返回进程内唯一的嵌入服务，首次调用时加载模型"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                model_path = config.EMBED_ONNX_PATH if config.EMBED_BACKEND == "onnx" else config.EMBED_MODEL_PATH
+                print(f"embeddings.py: loading {config.EMBED_BACKEND} embedding model from {model_path}")
+                _service = EmbeddingService(
+                    model_path=model_path,
+                    batch_size=config.EMBED_BATCH_SIZE,
+                    num_threads=config.EMBED_NUM_THREADS,
+                    query_cache_size=config.QUERY_CACHE_SIZE,
+                    backend=config.EMBED_BACKEND,
+                    quantized=config.EMBED_ONNX_QUANTIZED
+                )
+    return _service
+
+def _collect_metrics():
+    """/metrics 渲染前同步查询向量缓存的命中率（模型未加载时跳过，避免抓取时加载模型）"""
+    if _service is None:
+        return
+    stats = _service.stats()
+    lookups = stats["query_cache_hits"] + stats["query_cache_misses"]
+    CACHE_HIT_RATE.set(stats["query_cache_hits"] / lookups if lookups else 0.0, cache="query_embedding")
+    CACHE_ENTRIES.set(stats["query_cache_size"], cache="query_embedding")
+
+REGISTRY.add_callback(_collect_metrics)
@@ -0,0 +1,117 @@
+"""
+可插拔的生成后端
+
+由 config.GENERATOR_BACKEND 选择：
+- ollama: 本地 Ollama（默认）
+- openai: 任意 OpenAI 兼容的本地服务（vLLM、llama.cpp server 等），需要 langchain-openai
+- fake: 确定性假模型，可配置延迟和 token 速率，用于无 LLM 环境下的压测
+"""
+import asyncio
+import hashlib
+import time
+import urllib.request
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+import config
+
+_FILLER = ["the", "ECU", "specification", "is", "listed", "in", "the", "manual", "for", "this", "model"]
+
+class FakeChatModel(BaseChatModel):
+    """确定性假模型：同样的输入总是得到同样的输出，按配置的延迟和 token 速率返回"""
+
+    latency: float = 0.05           # 首个 token 前的延迟（秒）
+    tokens_per_second: float = 50   # 0 表示不限速
+    num_tokens: int = 32
+
+    @property
+    def _llm_type(self) -> str:
+        return "ecu-fake"
+
+    def _tokens(self, messages: List[BaseMessage]) -> list[str]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        words = [f"[fake:{digest}]"] + [_FILLER[i % len(_FILLER)] for i in range(max(self.num_tokens - 1, 0))]
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + self._token_delay() * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + self._token_delay() * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens(messages):
+            time.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(messages):
+            await asyncio.sleep(self._token_delay())
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+def create_llm(backend: str | None = None) -> BaseChatModel:
+    """按配置创建生成后端"""
+    backend = backend or config.GENERATOR_BACKEND
+    if backend == "ollama":
+        from langchain_ollama import ChatOllama
+        return ChatOllama(
+            model=config.LLM_MODEL,
+            base_url=config.OLLAMA_BASE_URL,
+            temperature=config.LLM_TEMPERATURE,
+            num_predict=config.LLM_MAX_TOKENS,
+            timeout=config.LLM_TIMEOUT
+        )
+    if backend == "openai":
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError as e:
+            raise ImportError("The 'openai' generator backend requires langchain-openai: pip install -e .[openai]") from e
+        return ChatOpenAI(
+            model=config.LLM_MODEL,
+            base_url=config.OPENAI_BASE_URL,
+            api_key=config.OPENAI_API_KEY,
+            temperature=config.LLM_TEMPERATURE,
+            max_tokens=config.LLM_MAX_TOKENS,
+            timeout=config.LLM_TIMEOUT
+        )
+    if backend == "fake":
+        return FakeChatModel(
+            latency=config.FAKE_LLM_LATENCY,
+            tokens_per_second=config.FAKE_LLM_TOKENS_PER_SECOND,
+            num_tokens=config.FAKE_LLM_TOKENS
+        )
+    raise ValueError(f"Unknown generator backend: {backend!r} (expected 'ollama', 'openai' or 'fake')")
+
+def probe_backend(backend: str | None = None, timeout: float | None = None):
+    """
+    轻量探测生成后端是否可达（不做生成）：ollama 请求 /api/tags，openai 请求 /models。
+    不可达时抛出异常。
+    """
+    backend = backend or config.GENERATOR_BACKEND
+    timeout = config.LLM_PROBE_TIMEOUT if timeout is None else timeout
+    if backend == "fake":
+        return
+    if backend == "ollama":
+        request = urllib.request.Request(config.OLLAMA_BASE_URL.rstrip("/") + "/api/tags")
+    elif backend == "openai":
+        request = urllib.request.Request(config.OPENAI_BASE_URL.rstrip("/") + "/models",
+                                         headers={"Authorization": f"Bearer {config.OPENAI_API_KEY}"})
+    else:
+        raise ValueError(f"Unknown generator backend: {backend!r} (expected 'ollama', 'openai' or 'fake')")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
@@ -0,0 +1,109 @@
+"""
+离线建索引命令行工具
+
+索引在部署前构建，服务进程只加载构建好的索引。
+
+用法:
+    python src/index_cli.py build [--mode per_series|unified|all] [--batch-size 256] [--workers N] [--threads N]
+                                  [--dtype float32|float16|int8]
+    ecu-agent-index build ...
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 允许以脚本方式运行（python src/index_cli.py）
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import config
+from embeddings import get_embedding_service
+from indexing import discover_manuals, load_manifest, load_source_chunks
+from rag import SERIES, UNIFIED_INDEX, build_index, index_dir, index_sources, write_snapshot
+from spec_index import SpecIndex
+from vector_index import DTYPES
+
+def _parse_job(job):
+    path, series = job
+    return load_source_chunks(path, series)
+
+def _index_names(mode: str) -> list[str]:
+    if mode == "per_series":
+        return list(SERIES)
+    if mode == UNIFIED_INDEX:
+        return [UNIFIED_INDEX]
+    return list(SERIES) + [UNIFIED_INDEX]
+
+def build(args) -> int:
+    manuals = discover_manuals(Path(args.data_dir))
+    print(f"📚 发现 {len(manuals)} 个手册: {args.data_dir}")
+    if not manuals:
+        return 1
+
+    embedder = get_embedding_service()
+    embedder.set_batch_size(args.batch_size)
+    if args.threads > 0:
+        embedder.set_num_threads(args.threads)
+
+    workers = args.workers
+    if workers <= 0:
+        # 进程数不超过可用 CPU（亲和性与 CFS 配额）和手册数
+        from serve import available_cpus
+        workers = min(available_cpus(), len(manuals))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 多个手册在进程池中并行解析
+        def parse_sources(jobs):
+            return list(pool.map(_parse_job, jobs))
+
+        for name in _index_names(args.mode):
+            before = embedder.stats()["documents"]
+            start = time.perf_counter()
+            vectorstore, changed = build_index(
+                name,
+                sources=index_sources(name, manuals),
+                parse_sources=parse_sources,
+                batch_size=args.batch_size
+            )
+            elapsed = time.perf_counter() - start
+            embedded = embedder.stats()["documents"] - before
+            manifest = load_manifest(index_dir(name)) or {"sources": {}}
+            total = sum(len(entry["chunks"]) for entry in manifest["sources"].values())
+            rate = embedded / elapsed if elapsed > 0 else 0.0
+            status = "updated" if changed else "up to date"
+            print(f"✅ {name}: {status}, {total} chunks total, {embedded} embedded in {elapsed:.2f}s ({rate:.1f} chunks/s)")
+
+            # 服务进程以 mmap 方式加载的快照（ECU_VECTOR_BACKEND=numpy）
+            start = time.perf_counter()
+            snapshot = write_snapshot(name, args.dtype, vectorstore)
+            print(f"✅ {name}: snapshot ({args.dtype}, {snapshot.nbytes / 1024:.0f} KiB vectors) "
+                  f"written in {time.perf_counter() - start:.2f}s")
+
+    # 规格表精确查询索引
+    spec_index = SpecIndex.from_manuals(manuals)
+    os.makedirs(config.SPEC_INDEX_PATH.parent, exist_ok=True)
+    spec_index.save(config.SPEC_INDEX_PATH)
+    print(f"✅ spec index: {len(spec_index)} entries -> {config.SPEC_INDEX_PATH}")
+    return 0
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="ecu-agent-index", description="Build ECU agent vector indexes offline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="parse manuals, embed chunks and write indexes + manifests")
+    build_parser.add_argument("--data-dir", default=str(config.DATA_DIR), help="directory searched recursively for manuals")
+    build_parser.add_argument("--mode", choices=["per_series", UNIFIED_INDEX, "all"], default=config.INDEX_MODE)
+    build_parser.add_argument("--batch-size", type=int, default=config.INDEX_BATCH_SIZE, help="chunks per embedding batch")
+    build_parser.add_argument("--workers", type=int, default=0,
+                              help="processes used for parsing (0 = min(available CPUs, manuals))")
+    build_parser.add_argument("--threads", type=int, default=0, help="intra-op threads for embedding (0 = default)")
+    build_parser.add_argument("--dtype", choices=DTYPES, default=config.VECTOR_DTYPE, help="vector precision of the mmap snapshot")
+    build_parser.set_defaults(func=build)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
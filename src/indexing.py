@@ -0,0 +1,170 @@
+"""
+索引 manifest 与增量重建
+
+每个持久化目录下保存 manifest.json，记录嵌入模型 id、每个手册的文件哈希及其 chunk 哈希。
+启动时未变化的手册既不解析也不嵌入；变化的手册只删除/新增有差异的 chunk。
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from langchain_core.documents import Document
+from utils import iter_docs_from_markdown
+import config
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def chunk_id(doc: Document) -> str:
+    """chunk 哈希：正文 + 元数据，同时用作 Chroma 中的文档 id"""
+    payload = doc.page_content + "\0" + json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def source_key(path: Path) -> str:
+    """manifest 中的文件键：项目内文件使用相对路径，便于迁移"""
+    path = Path(path).resolve()
+    try:
+        return path.relative_to(config.PROJECT_ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+def load_manifest(persist_dir: Path) -> dict | None:
+    path = Path(persist_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(persist_dir: Path, manifest: dict):
+    """先写临时文件再替换，避免中途失败留下损坏的 manifest"""
+    path = Path(persist_dir) / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+# 文件名规则 → 系列（按顺序匹配第一条）
+SERIES_FILE_RULES = [
+    (re.compile(r"700", re.IGNORECASE), "700"),
+    (re.compile(r"800.*base", re.IGNORECASE), "800B"),
+    (re.compile(r"800.*plus", re.IGNORECASE), "800P"),
+]
+
+def infer_series(path: Path) -> str | None:
+    """根据手册文件名推断系列，无法识别时返回 None"""
+    for pattern, series in SERIES_FILE_RULES:
+        if pattern.search(Path(path).name):
+            return series
+    return None
+
+def discover_manuals(data_dir: Path) -> dict[Path, str]:
+    """递归查找数据目录下所有可识别系列的 markdown 手册，返回 {路径: 系列}"""
+    manuals = {}
+    for path in sorted(Path(data_dir).rglob("*.md")):
+        series = infer_series(path)
+        if series is None:
+            print(f"⏭️ 跳过无法识别系列的文件: {path}")
+            continue
+        manuals[path] = series
+    return manuals
+
+def load_source_chunks(path: Path, series: str) -> dict[str, Document]:
+    """解析一个手册，返回 {chunk_id: Document}，每个 chunk 带上 series 元数据"""
+    chunks = {}
+    for doc in iter_docs_from_markdown(str(path)):
+        doc.metadata["series"] = series
+        chunks[chunk_id(doc)] = doc
+    return chunks
+
+def plan_sync(manifest: dict | None, sources: dict[Path, str]) -> dict:
+    """
+    对比 manifest 和当前手册，得出需要的变更。
+
+    返回:
+        dict: {"rebuild": bool, "hashes": {key: sha}, "changed": [(path, key)], "removed": [key]}
+    """
+    rebuild = manifest is None or manifest.get("embedding_model") != config.EMBED_MODEL_ID
+    known = {} if rebuild else manifest.get("sources", {})
+    hashes = {}
+    changed = []
+    for path in sources:
+        key = source_key(path)
+        hashes[key] = file_sha256(path)
+        if known.get(key, {}).get("sha256") != hashes[key]:
+            changed.append((path, key))
+    removed = [key for key in known if key not in hashes]
+    return {"rebuild": rebuild, "hashes": hashes, "changed": changed, "removed": removed}
+
+def add_chunks(vectorstore, chunks: dict[str, Document], batch_size: int = 256):
+    """按批嵌入并写入 chunk（每批一次嵌入前向 + 一次 Chroma 写入）"""
+    ids = list(chunks)
+    for i in range(0, len(ids), batch_size):
+        batch_ids = ids[i:i + batch_size]
+        vectorstore.add_documents([chunks[cid] for cid in batch_ids], ids=batch_ids)
+
+def sync_index(vectorstore, persist_dir: Path, sources: dict[Path, str], reset_collection,
+               parse_sources=None, batch_size: int = 256) -> tuple[object, bool]:
+    """
+    让向量库与手册内容保持一致，只处理有变化的部分。
+
+    参数:
+        sources: {手册路径: 系列}
+        reset_collection: 无 manifest 或嵌入模型变化时调用，返回清空后的新向量库
+        parse_sources: 可选，接收 [(路径, 系列)] 并返回对应 chunk dict 列表（如用进程池并行解析）
+        batch_size: 每批嵌入和写入的 chunk 数
+
+    返回:
+        (vectorstore, changed): changed 表示索引内容是否发生了变化
+    """
+    manifest = load_manifest(persist_dir)
+    plan = plan_sync(manifest, sources)
+    if not plan["rebuild"] and not plan["changed"] and not plan["removed"]:
+        print(f"📂 索引未变化，跳过解析和嵌入: {persist_dir}")
+        return vectorstore, False
+
+    if plan["rebuild"]:
+        print(f"🆕 无有效 manifest 或嵌入模型已变化，重建索引: {persist_dir}")
+        vectorstore = reset_collection()
+        manifest = {"sources": {}}
+    entries = dict(manifest.get("sources", {}))
+
+    to_delete = []
+    for key in plan["removed"]:
+        to_delete += entries.pop(key)["chunks"]
+
+    jobs = [(path, sources[path]) for path, _ in plan["changed"]]
+    if parse_sources is None:
+        parsed = [load_source_chunks(path, series) for path, series in jobs]
+    else:
+        parsed = parse_sources(jobs)
+
+    to_add = {}
+    for (path, key), chunks in zip(plan["changed"], parsed):
+        old_ids = set(entries.get(key, {}).get("chunks", []))
+        to_delete += [cid for cid in old_ids if cid not in chunks]
+        to_add.update({cid: doc for cid, doc in chunks.items() if cid not in old_ids})
+        entries[key] = {"sha256": plan["hashes"][key], "series": sources[path], "chunks": list(chunks)}
+        print(f"🔄 {key}: +{len(chunks.keys() - old_ids)} / -{len(old_ids - chunks.keys())} chunks")
+
+    if to_delete:
+        vectorstore.delete(ids=to_delete)
+    if to_add:
+        add_chunks(vectorstore, to_add, batch_size)
+
+    save_manifest(persist_dir, {
+        "version": MANIFEST_VERSION,
+        "embedding_model": config.EMBED_MODEL_ID,
+        "sources": entries
+    })
+    return vectorstore, True
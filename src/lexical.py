@@ -0,0 +1,106 @@
+"""
+内存中的 BM25 倒排索引
+
+与向量库使用同一批 chunk 构建。每个词的倒排表预先算好 BM25 权重，
+查询时只需对命中的倒排表做一次向量化累加，再按系列过滤并取 top-k。
+"""
+import re
+import numpy as np
+from langchain_core.documents import Document
+
+# 保留型号、规格等带连字符/小数点的词（如 ecu-850b、lpddr4、1.5），同时拆出其组成部分
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token or "." in token:
+            tokens += [part for part in re.split(r"[-.]", token) if part]
+    return tokens
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+def doc_key(doc: Document) -> tuple:
+    """融合时识别同一个 chunk"""
+    return doc.metadata.get("source"), doc.page_content
+
+class BM25Index:
+
+    def __init__(self, docs: list[Document], k1: float = 1.5, b: float = 0.75):
+        self.docs = docs
+        # 系列 → 行号数组，带系列过滤的查询只对这些行取 top-k（与 vector_index._series_rows 相同）
+        series_rows = {}
+        for i, doc in enumerate(docs):
+            series_rows.setdefault(doc.metadata.get("series", ""), []).append(i)
+        self._series_rows = {s: np.array(rows, dtype=np.int64) for s, rows in series_rows.items()}
+        term_freqs = []
+        doc_len = np.zeros(len(docs), dtype=np.float32)
+        df = {}
+        for i, doc in enumerate(docs):
+            tf = {}
+            for token in tokenize(doc.page_content):
+                tf[token] = tf.get(token, 0) + 1
+            term_freqs.append(tf)
+            doc_len[i] = sum(tf.values())
+            for token in tf:
+                df[token] = df.get(token, 0) + 1
+
+        n = len(docs)
+        avgdl = float(doc_len.mean()) if n else 0.0
+        postings = {}
+        for i, tf in enumerate(term_freqs):
+            norm = k1 * (1 - b + b * doc_len[i] / avgdl) if avgdl else k1
+            for token, freq in tf.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(i)
+                postings[token][1].append(freq * (k1 + 1) / (freq + norm))
+        # 倒排表：词 → (文档下标数组, 已乘 idf 的 BM25 权重数组)
+        self._postings = {}
+        for token, (ids, weights) in postings.items():
+            idf = np.log(1 + (n - df[token] + 0.5) / (df[token] + 0.5))
+            self._postings[token] = (np.array(ids, dtype=np.int32), np.array(weights, dtype=np.float32) * idf)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query: str, k: int = 8, series: str | None = None) -> list[Document]:
+        """返回 BM25 得分最高的 k 个 chunk（得分为 0 的不返回）"""
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self._postings.get(token)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        if series is None:
+            rows, row_scores = None, scores
+        else:
+            rows = self._series_rows.get(series, _NO_ROWS)
+            row_scores = scores[rows]
+        candidates = np.flatnonzero(row_scores > 0)
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-row_scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-row_scores[candidates], kind="stable")]
+        results = []
+        for i in candidates:
+            doc = self.docs[i if rows is None else rows[i]]
+            results.append(Document(page_content=doc.page_content,
+                                    metadata={**doc.metadata, "bm25": float(row_scores[i])}))
+        return results
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], limit: int, rrf_k: int = 60) -> list[Document]:
+    """按 RRF 融合多路排序结果，得分写入 metadata["rrf_score"]"""
+    scores = {}
+    first_seen = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+            if key in first_seen:
+                # 合并两路的元数据（如稠密检索的 distance 和 BM25 得分）
+                first_seen[key].metadata = {**doc.metadata, **first_seen[key].metadata}
+            else:
+                first_seen[key] = doc
+    fused = sorted(scores, key=lambda key: -scores[key])[:limit]
+    for key in fused:
+        first_seen[key].metadata["rrf_score"] = scores[key]
+    return [first_seen[key] for key in fused]
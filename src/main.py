@@ -5,7 +5,7 @@ ECU Agent 主程序入口模块
 """
 
 #测试便捷回复
-from agent import query_ecu_agent
+from agent import query_ecu_agent_batch
 questions = [
         "What is the maximum operating temperature for the ECU-750?",
         "How much RAM does the ECU-850 have?",
@@ -21,11 +21,13 @@ questions = [
     
 print("🚀 Starting ECU Agent Test Suite...\n")
 
-for i, q in enumerate(questions, 1):
+batch = query_ecu_agent_batch(questions)
+for i, item in enumerate(batch["results"], 1):
         print(f"--- Question {i} ---")
-        print(f"❓ {q}")
-        try:
-            answer = query_ecu_agent(q)
-            print(f"✅ {answer}\n")
-        except Exception as e:
-            print(f"❌ Error: {e}\n")
+        print(f"❓ {item['question']}")
+        if item["error"]:
+            print(f"❌ Error: {item['error']}\n")
+        else:
+            print(f"✅ {item['answer']}\n")
+
+print(f"⏱️ Total: {batch['timings']['total_ms']:.0f} ms for {len(questions)} questions")
@@ -0,0 +1,171 @@
+"""
+轻量的 Prometheus 风格指标
+
+不依赖 prometheus_client：计数器、仪表盘和直方图都在进程内聚合，
+由 /metrics 按 Prometheus 文本格式输出。
+"""
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state["counts"]):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {state['count']}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {state['sum']}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._callbacks = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_callback(self, fn):
+        """渲染前调用，用于把其他组件的统计（如缓存命中）同步到仪表盘"""
+        self._callbacks.append(fn)
+
+    def render(self) -> str:
+        for fn in self._callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️ Metrics callback failed: {e}")
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "ecu_stage_latency_seconds", "Latency of agent graph nodes and pipeline components", ["stage", "series"]))
+ROUTING_DECISIONS = REGISTRY.register(Counter(
+    "ecu_routing_decisions_total", "Routing decisions made by route_question", ["route"]))
+DOCS_RETRIEVED = REGISTRY.register(Counter(
+    "ecu_docs_retrieved_total", "Documents returned by vector search", ["series"]))
+RETRIEVAL_ERRORS = REGISTRY.register(Counter(
+    "ecu_retrieval_errors_total", "Failed or timed out series lookups", ["series"]))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "ecu_llm_tokens_total", "Prompt and completion tokens sent to / produced by the generator", ["kind"]))
+FAST_PATH_ANSWERS = REGISTRY.register(Counter(
+    "ecu_fast_path_answers_total", "Answers served without the LLM", ["source"]))
+CACHE_HIT_RATE = REGISTRY.register(Gauge(
+    "ecu_cache_hit_rate", "Hit rate of in-process caches", ["cache"]))
+CACHE_ENTRIES = REGISTRY.register(Gauge(
+    "ecu_cache_entries", "Entries held by in-process caches", ["cache"]))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    "ecu_http_requests_in_flight", "HTTP requests currently being served", ["path"]))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "ecu_http_request_latency_seconds", "HTTP request latency", ["path", "method", "status"]))
+
+def instrument_stage(stage: str, fn):
+    """包装同步或异步的节点函数，记录其耗时"""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async_wrapper(*args, **kwargs):
+            with STAGE_LATENCY.time(stage=stage, series=""):
+                return await fn(*args, **kwargs)
+        return _async_wrapper
+
+    @functools.wraps(fn)
+    def _wrapper(*args, **kwargs):
+        with STAGE_LATENCY.time(stage=stage, series=""):
+            return fn(*args, **kwargs)
+    return _wrapper
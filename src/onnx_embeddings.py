@@ -0,0 +1,130 @@
+"""
+ONNX Runtime 嵌入后端
+
+把本地 bge 模型导出为 ONNX（可选 int8 动态量化），推理时只依赖 onnxruntime 和 tokenizers，
+不导入 torch。bge 使用 [CLS] 向量并做 L2 归一化，与 sentence-transformers 的输出一致。
+"""
+import shutil
+from pathlib import Path
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+class OnnxEmbeddings(Embeddings):
+
+    def __init__(self, model_dir: str, quantized: bool = True, batch_size: int = 32,
+                 num_threads: int = 0, max_length: int = 512):
+        from tokenizers import Tokenizer
+        self.model_dir = Path(model_dir)
+        self.model_file = self.model_dir / (ONNX_INT8_FILE if quantized else ONNX_FILE)
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self._session = self._create_session()
+
+    def _create_session(self):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if self.num_threads > 0:
+            options.intra_op_num_threads = self.num_threads
+        session = ort.InferenceSession(str(self.model_file), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in session.get_inputs()}
+        return session
+
+    def set_num_threads(self, num_threads: int):
+        """ORT 的线程数只能在创建会话时指定，因此重建会话（fork 后的 worker 也需要自己的会话）"""
+        self.num_threads = num_threads
+        self._session = self._create_session()
+
+    @property
+    def model_bytes(self) -> int:
+        return self.model_file.stat().st_size
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self._session.run(None, feeds)[0]
+        cls = hidden[:, 0]
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self.encode(texts[i:i + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encode([text])[0].tolist()
+
+def export_onnx(model_path: str, output_dir: str, quantize: bool = True, opset: int = 17) -> dict:
+    """
+    导出 ONNX 模型和 tokenizer 到 output_dir；quantize 时额外生成 int8 动态量化版本。
+    导出需要 torch + transformers + onnx，推理端不需要。
+
+    返回:
+        dict: {文件名: 字节数}
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+    model = AutoModel.from_pretrained(str(model_path)).eval()
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    sample = tokenizer(["ECU export sample", "a longer second sample sentence"], padding=True, return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(
+            _LastHiddenState(model),
+            tuple(sample[name] for name in INPUT_NAMES),
+            str(output_dir / ONNX_FILE),
+            input_names=INPUT_NAMES,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    tokenizer.save_pretrained(str(output_dir))
+    # 保留 sentence-transformers 的配置，便于核对池化方式
+    for name in ("config.json", "sentence_bert_config.json"):
+        if (Path(model_path) / name).exists():
+            shutil.copy(Path(model_path) / name, output_dir / name)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(output_dir / ONNX_FILE), str(output_dir / ONNX_INT8_FILE), weight_type=QuantType.QInt8)
+
+    return {p.name: p.stat().st_size for p in output_dir.glob("*.onnx")}
+
+def parity_check(reference: Embeddings, candidate: Embeddings, texts: list[str]) -> dict:
+    """两个后端对同一批文本的余弦一致性（两者输出均已归一化，点积即余弦）"""
+    a = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    cosine = (a * b).sum(axis=1)
+    return {
+        "texts": len(texts),
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "p01_cosine": float(np.percentile(cosine, 1))
+    }
@@ -1,67 +1,430 @@
 import os
-from pathlib import Path
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from utils import load_docs_from_markdown
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from langchain_core.documents import Document
+from embeddings import get_embedding_service
+from indexing import MANIFEST_NAME, discover_manuals, file_sha256, load_manifest, sync_index
+from lexical import BM25Index, reciprocal_rank_fusion
+from vector_index import NumpyVectorIndex, read_snapshot_header
+import config
+from metrics import STAGE_LATENCY, DOCS_RETRIEVED
+from spec_index import reset_spec_index
+
+# 所有已知的 ECU 系列
+SERIES = ["700", "800B", "800P"]
+
+UNIFIED_INDEX = "unified"
 
 # 全局缓存，避免重复加载
 _vectorstores = {}
+_vectorstores_lock = threading.Lock()
+
+# 索引内容变化时递增（进程内 INDEX_AUTO_BUILD 更新，或检测到离线重建后重新加载），
+# 依赖索引内容的缓存（回答缓存、BM25）据此失效
+_index_version = 0
+
+# 已加载索引打开时 manifest 的 (mtime, size)；index_cli 重建会原子替换 manifest，据此发现离线重建
+_loaded_stamps = {}
+_stamps_checked_at = 0.0
+
+def _manifest_stamp(name: str):
+    try:
+        stat = os.stat(index_dir(name) / MANIFEST_NAME)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+def reload_if_rebuilt() -> bool:
+    """
+    最多每 INDEX_RELOAD_CHECK_INTERVAL 秒检查一次已加载索引的 manifest。
+    发现离线重建后丢弃已加载的向量库（含 mmap 快照）和规格索引，下次使用时重新加载，
+    并递增索引版本使回答缓存和 BM25 失效。间隔为 0 时不检查（重建后需重启服务）。
+    """
+    global _stamps_checked_at, _index_version
+    interval = config.INDEX_RELOAD_CHECK_INTERVAL
+    now = time.monotonic()
+    if interval <= 0 or now - _stamps_checked_at < interval:
+        return False
+    _stamps_checked_at = now
+    if not any(_manifest_stamp(name) != stamp for name, stamp in list(_loaded_stamps.items())):
+        return False
+    with _vectorstores_lock:
+        stale = [name for name, stamp in _loaded_stamps.items() if _manifest_stamp(name) != stamp]
+        if not stale:
+            return False
+        for name in stale:
+            _vectorstores.pop(name, None)
+            _loaded_stamps.pop(name)
+        _index_version += 1
+    reset_spec_index()
+    print(f"🔄 Index rebuilt on disk, reloading: {stale}")
+    return True
+
+def get_index_version() -> int:
+    reload_if_rebuilt()
+    return _index_version
+
+def bump_index_version():
+    global _index_version
+    _index_version += 1
+
+def _get_index(name: str):
+    reload_if_rebuilt()
+    if name in _vectorstores:
+        return _vectorstores[name]
+    # 并发检索时可能多个线程同时首次加载同一索引
+    with _vectorstores_lock:
+        if name in _vectorstores:
+            return _vectorstores[name]
+        vectorstore = open_index(name)
+        _vectorstores[name] = vectorstore
+        _loaded_stamps[name] = _manifest_stamp(name)
+        return vectorstore
 
 def get_vectorstore(series: str):
-    if series in _vectorstores:
-        return _vectorstores[series]
-    # 定义本地持久化路径（与src同目录下的 chroma_db/ 子文件夹),基于当前文件位置计算
-    current_file = Path(__file__).resolve()  # rag.py 的绝对路径
-    project_root = current_file.parent.parent  # 项目根目录
-    persist_dir = project_root / "chroma_db" / f"ecu_{series}"
-    os.makedirs(persist_dir, exist_ok=True)
-
-    # 加载文档
-    data_dir = project_root / "data"
-    file_map = {
-        "700": data_dir / "ECU-700_Series_Manual.md",
-        "800B": data_dir / "ECU-800_Series_Base.md",
-        "800P": data_dir / "ECU-800_Series_Plus.md"
-    }
-    docs = load_docs_from_markdown(str(file_map[series])) #传入的参数是str型，而不是file_path型
-    # 创建嵌入模型
-    models_dir = project_root / "models"
-    local_model_path = models_dir / "bge-small-en-v1.5"
-    print(f"rag.py: local_model_path: {local_model_path}")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=str(local_model_path),  # 指向本地目录，传入的参数是str型，而不是file_path型
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True}
+    return _get_index(series)
+
+def get_unified_vectorstore():
+    """所有系列共用一个集合，每个 chunk 在入库时带上 series 元数据"""
+    return _get_index(UNIFIED_INDEX)
+
+def index_dir(name: str):
+    # 本地持久化路径（与src同目录下的 chroma_db/ 子文件夹）
+    return config.CHROMA_DIR / f"ecu_{name}"
+
+def index_sources(name: str, manuals: dict | None = None) -> dict:
+    """索引对应的手册 {路径: 系列}：系列索引只含本系列，统一索引包含全部"""
+    manuals = discover_manuals(config.DATA_DIR) if manuals is None else manuals
+    if name == UNIFIED_INDEX:
+        return dict(manuals)
+    return {path: s for path, s in manuals.items() if s == name}
+
+def _chroma(name: str):
+    # 所有集合共享同一个嵌入服务（同一份 bge 模型）；Chroma 会自动持久化
+    # chromadb 导入较慢，且使用 mmap 快照时完全不需要，因此在首次打开集合时才导入
+    from langchain_chroma import Chroma
+    return Chroma(
+        persist_directory=str(index_dir(name)),
+        embedding_function=get_embedding_service(),
+        collection_name=f"ecu_{name}_collection"
     )
-    #embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-    # 🔍 调试：打印第一条文档的 embedding 向量（前10个值）
-    if docs:
-        sample_text = docs[0].page_content[:100]  # 取前100字符作为样本
-        # print(f"\n[DEBUG] Embedding sample text (series={series}):")
-        # print(f"Text: {repr(sample_text)}")
-
-        # 手动生成 embedding
-        embedding_vector = embeddings.embed_query(sample_text)
-        # print(f"Embedding shape: {len(embedding_vector)}")
-        # print(f"First 10 values: {embedding_vector[:10]}\n")
-
-    # 检查是否已有持久化数据
-    if os.listdir(persist_dir):  # 非空目录 → 已存在
-        print(f"📂 加载已存在的 ChromaDB: {persist_dir}")
-        vectorstore = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embeddings,
-            collection_name=f"ecu_{series}_collection"
-        )
-    else:
-        # 首次创建：从文档构建并持久化
-        print(f"🆕 首次构建 ChromaDB 并保存到: {persist_dir}")
-        vectorstore = Chroma.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            persist_directory=persist_dir,
-            collection_name=f"ecu_{series}_collection"
+
+def build_index(name: str, sources: dict | None = None, parse_sources=None, batch_size: int | None = None):
+    """
+    构建或增量更新一个索引（按 manifest 只处理有变化的手册）。
+
+    返回:
+        (vectorstore, changed)
+    """
+    os.makedirs(index_dir(name), exist_ok=True)
+
+    def _reset():
+        _chroma(name).delete_collection()
+        return _chroma(name)
+
+    return sync_index(
+        _chroma(name), index_dir(name),
+        index_sources(name) if sources is None else sources,
+        _reset,
+        parse_sources=parse_sources,
+        batch_size=batch_size or config.INDEX_BATCH_SIZE
+    )
+
+def open_index(name: str):
+    """服务进程加载索引：默认只打开离线构建好的索引，不在请求路径上构建"""
+    persist_dir = index_dir(name)
+    if config.INDEX_AUTO_BUILD:
+        vectorstore, changed = build_index(name)
+        if changed:
+            bump_index_version()
+        return _with_backend(name, vectorstore)
+    if load_manifest(persist_dir) is None:
+        raise RuntimeError(
+            f"Index '{name}' has not been built at {persist_dir}; "
+            f"run `python src/index_cli.py build` (or set ECU_INDEX_AUTO_BUILD=1)"
         )
-        # Chroma 会自动持久化，无需显式调用 persist()
-    _vectorstores[series] = vectorstore
-    return vectorstore
+    if config.VECTOR_BACKEND == "numpy":
+        snapshot = open_snapshot(name)
+        if snapshot is not None:
+            return snapshot
+    print(f"📂 加载已构建的 ChromaDB: {persist_dir}")
+    return _with_backend(name, _chroma(name))
+
+def snapshot_dir(name: str):
+    return index_dir(name) / "snapshot"
+
+def write_snapshot(name: str, dtype: str | None = None, vectorstore=None) -> NumpyVectorIndex:
+    """把已构建的 Chroma 集合导出为 mmap 快照，记录对应 manifest 的哈希用于判断是否过期"""
+    index = NumpyVectorIndex.from_vectorstore(
+        vectorstore if vectorstore is not None else _chroma(name),
+        dtype or config.VECTOR_DTYPE,
+        series=None if name == UNIFIED_INDEX else name
+    )
+    index.save(snapshot_dir(name), manifest_sha256=file_sha256(index_dir(name) / MANIFEST_NAME))
+    return index
+
+def open_snapshot(name: str) -> NumpyVectorIndex | None:
+    """加载与当前 manifest 一致的快照；快照缺失或过期时返回 None，由调用方回退到 Chroma"""
+    path = snapshot_dir(name)
+    header = read_snapshot_header(path)
+    if header is None:
+        return None
+    manifest_path = index_dir(name) / MANIFEST_NAME
+    if not manifest_path.exists() or header.get("manifest_sha256") != file_sha256(manifest_path):
+        print(f"⚠️ Snapshot for '{name}' is stale, falling back to ChromaDB; rerun `python src/index_cli.py build`")
+        return None
+    if header["dtype"] != config.VECTOR_DTYPE:
+        print(f"⚠️ Snapshot for '{name}' is stored as {header['dtype']} (ECU_VECTOR_DTYPE={config.VECTOR_DTYPE})")
+    index = NumpyVectorIndex.load(path)
+    print(f"📂 Memory-mapped snapshot for '{name}': {len(index)} chunks ({header['dtype']})")
+    return index
+
+def _with_backend(name: str, vectorstore):
+    """numpy 后端：把 Chroma 集合中的向量一次性载入进程内矩阵，之后检索不再经过 Chroma"""
+    if config.VECTOR_BACKEND != "numpy":
+        return vectorstore
+    index = NumpyVectorIndex.from_vectorstore(
+        vectorstore, config.VECTOR_DTYPE, series=None if name == UNIFIED_INDEX else name
+    )
+    print(f"✅ Loaded {len(index)} vectors for '{name}' into memory "
+          f"({config.VECTOR_DTYPE}, {index.nbytes / 1024:.0f} KiB)")
+    return index
+
+def _with_distance(doc: Document, distance: float) -> Document:
+    """把检索距离记录到元数据中（越小越相关），供上下文打包排序"""
+    doc.metadata["distance"] = float(distance)
+    return doc
+
+def series_filter(series_list: list[str]) -> dict:
+    """把路由结果转换为 Chroma 元数据过滤条件"""
+    if len(series_list) == 1:
+        return {"series": series_list[0]}
+    return {"series": {"$in": list(series_list)}}
+
+def search_unified_batch(series_list: list[str], query_vectors: list[list[float]], k: int = 2) -> list[list[Document]]:
+    """
+    统一索引模式：一次过滤查询覆盖所有目标系列，多取 UNIFIED_OVERFETCH 倍候选后每个系列各保留 k 个。
+    全局 top-k 不保证每个系列都有结果，因此候选中不足 k 个的系列再按该系列单独查询一次，
+    与按系列索引模式一样，比较类问题的每个系列都能取到 k 个 chunk。
+
+    返回:
+        list: 与 query_vectors 一一对应，文档按 series_list 顺序排列
+    """
+    vectorstore = get_unified_vectorstore()
+    fetch = k if len(series_list) == 1 else k * len(series_list) * config.UNIFIED_OVERFETCH
+    with STAGE_LATENCY.time(stage=config.VECTOR_BACKEND, series=UNIFIED_INDEX):
+        per_query = []
+        for docs in _query_collection(vectorstore, query_vectors, fetch, where=series_filter(series_list)):
+            by_series = {s: [] for s in series_list}
+            for doc in docs:
+                bucket = by_series.get(doc.metadata.get("series"))
+                if bucket is not None and len(bucket) < k:
+                    bucket.append(doc)
+            per_query.append(by_series)
+        if len(series_list) > 1:
+            for s in series_list:
+                short = [i for i, by_series in enumerate(per_query) if len(by_series[s]) < k]
+                if not short:
+                    continue
+                extra = _query_collection(vectorstore, [query_vectors[i] for i in short], k, where=series_filter([s]))
+                for i, docs in zip(short, extra):
+                    per_query[i][s] = docs
+    results = [[doc for s in series_list for doc in by_series[s]] for by_series in per_query]
+    for docs in results:
+        for doc in docs:
+            DOCS_RETRIEVED.inc(series=doc.metadata.get("series", ""))
+    return results
+
+def search_unified(series_list: list[str], query_vector: list[float], k: int = 2) -> list[Document]:
+    """统一索引模式的单个问题检索，每个目标系列最多 k 个结果"""
+    return search_unified_batch(series_list, [query_vector], k)[0]
+
+def _query_collection(vectorstore, query_vectors: list[list[float]], k: int, where: dict | None = None) -> list[list[Document]]:
+    """一次调用检索多个查询向量"""
+    if isinstance(vectorstore, NumpyVectorIndex):
+        return [[_with_distance(doc, distance) for doc, distance in results]
+                for results in vectorstore.search_by_vectors(query_vectors, k, filter=where)]
+    results = vectorstore._collection.query(
+        query_embeddings=query_vectors,
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
+    return [
+        [_with_distance(Document(page_content=text, metadata=dict(meta or {})), distance)
+         for text, meta, distance in zip(texts, metas, distances)]
+        for texts, metas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+    ]
+
+def search_series_batch(series: str, query_vectors: list[list[float]], k: int = 2) -> list[list[Document]]:
+    """单个系列的批量检索，每个查询向量返回一组带系列标签的文档"""
+    vectorstore = get_vectorstore(series)
+    with STAGE_LATENCY.time(stage=f"{config.VECTOR_BACKEND}_batch", series=series):
+        groups = _query_collection(vectorstore, query_vectors, k)
+    for docs in groups:
+        for doc in docs:
+            doc.metadata["series"] = series
+        DOCS_RETRIEVED.inc(len(docs), series=series)
+    return groups
+
+def retrieve_batch_by_vector(series_list: list[str], query_vectors: list[list[float]],
+                             k: int = 2) -> tuple[list[list[Document]], dict]:
+    """
+    同一路由结果下的一组问题批量检索：每个系列（或统一索引）只查询一次。
+
+    返回:
+        (groups, errors): groups[i] 对应 query_vectors[i]，文档按 series_list 顺序排列
+    """
+    if config.INDEX_MODE == UNIFIED_INDEX:
+        try:
+            return search_unified_batch(series_list, query_vectors, k), {}
+        except Exception as e:
+            return [[] for _ in query_vectors], {UNIFIED_INDEX: str(e)}
+
+    executor = _get_executor()
+    futures = [(s, executor.submit(search_series_batch, s, query_vectors, k)) for s in series_list]
+    groups = [[] for _ in query_vectors]
+    errors = {}
+    # 与 search_many_series 相同：所有系列同时开始，共享一个截止时间，最坏耗时为一个超时而非 N 个
+    deadline = time.monotonic() + config.RETRIEVAL_TIMEOUT
+    for s, future in futures:
+        try:
+            for i, docs in enumerate(future.result(timeout=max(0.0, deadline - time.monotonic()))):
+                groups[i].extend(docs)
+        except FutureTimeoutError:
+            future.cancel()
+            errors[s] = f"timed out after {config.RETRIEVAL_TIMEOUT}s"
+        except Exception as e:
+            errors[s] = str(e)
+    return groups, errors
+
+def retrieve_by_vector(series_list: list[str], query_vector: list[float], k: int = 2) -> tuple[list[Document], dict]:
+    """按配置的索引模式检索，返回 (docs, errors)"""
+    if config.INDEX_MODE == UNIFIED_INDEX:
+        try:
+            return search_unified(series_list, query_vector, k), {}
+        except Exception as e:
+            return [], {UNIFIED_INDEX: str(e)}
+    return search_many_series(series_list, query_vector, k)
+
+# BM25 词法索引：与向量库同源，索引版本变化后在下次使用时重建
+_lexical_index = None
+_lexical_version = -1
+_lexical_lock = threading.Lock()
+
+def get_lexical_index() -> BM25Index:
+    global _lexical_index, _lexical_version
+    version = get_index_version()
+    if _lexical_index is not None and _lexical_version == version:
+        return _lexical_index
+    with _lexical_lock:
+        if _lexical_index is None or _lexical_version != version:
+            if config.INDEX_MODE == UNIFIED_INDEX:
+                stores = [(None, get_unified_vectorstore())]
+            else:
+                stores = [(s, get_vectorstore(s)) for s in SERIES]
+            docs = []
+            for series, vectorstore in stores:
+                data = vectorstore.get(include=["documents", "metadatas"])
+                for text, metadata in zip(data["documents"], data["metadatas"]):
+                    metadata = dict(metadata or {})
+                    if series is not None:
+                        metadata["series"] = series
+                    docs.append(Document(page_content=text, metadata=metadata))
+            _lexical_index = BM25Index(docs)
+            _lexical_version = version
+            print(f"✅ Built BM25 index over {len(docs)} chunks")
+    return _lexical_index
+
+def fuse_with_lexical(dense_docs: list[Document], question: str, series_list: list[str], k: int = 2) -> list[Document]:
+    """每个系列内把稠密检索结果与 BM25 结果做 RRF 融合，各取前 k 个，按 series_list 顺序拼接"""
+    try:
+        lexical = get_lexical_index()
+    except Exception as e:
+        print(f"⚠️ BM25 index unavailable, using dense results only: {e}")
+        lexical = None
+    fused = []
+    with STAGE_LATENCY.time(stage="lexical", series="all"):
+        for s in series_list:
+            dense = [d for d in dense_docs if d.metadata.get("series") == s]
+            if lexical is None:
+                fused += dense[:k]
+                continue
+            sparse = lexical.search(question, k=config.HYBRID_CANDIDATES, series=s)
+            fused += reciprocal_rank_fusion([dense, sparse], k, config.RRF_K)
+    return fused
+
+def retrieve(series_list: list[str], question: str, query_vector: list[float], k: int = 2) -> tuple[list[Document], dict]:
+    """检索入口：开启混合检索时，稠密检索多取候选，再与 BM25 结果融合"""
+    if not config.HYBRID_RETRIEVAL:
+        return retrieve_by_vector(series_list, query_vector, k)
+    dense, errors = retrieve_by_vector(series_list, query_vector, max(k, config.HYBRID_CANDIDATES))
+    return fuse_with_lexical(dense, question, series_list, k), errors
+
+def retrieve_batch(series_list: list[str], questions: list[str], query_vectors: list[list[float]],
+                   k: int = 2) -> tuple[list[list[Document]], dict]:
+    """retrieve 的批量版本，groups[i] 对应 questions[i]"""
+    if not config.HYBRID_RETRIEVAL:
+        return retrieve_batch_by_vector(series_list, query_vectors, k)
+    groups, errors = retrieve_batch_by_vector(series_list, query_vectors, max(k, config.HYBRID_CANDIDATES))
+    return [fuse_with_lexical(docs, q, series_list, k) for docs, q in zip(groups, questions)], errors
+
+# 多系列检索共用的有界线程池
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.RETRIEVAL_MAX_WORKERS,
+                    thread_name_prefix="ecu-retrieval"
+                )
+    return _executor
+
+def _reset_executor_after_fork():
+    # fork 出的子进程不继承线程池中的线程，需要重新创建
+    global _executor
+    _executor = None
+
+os.register_at_fork(after_in_child=_reset_executor_after_fork)
+
+def search_series(series: str, query_vector: list[float], k: int = 2) -> list[Document]:
+    """用已嵌入的问题向量检索单个系列，并为结果打上系列标签"""
+    vectorstore = get_vectorstore(series)
+    with STAGE_LATENCY.time(stage=config.VECTOR_BACKEND, series=series):
+        results = vectorstore.similarity_search_by_vector_with_relevance_scores(query_vector, k=k)
+    docs = [_with_distance(doc, distance) for doc, distance in results]
+    for doc in docs:
+        doc.metadata["series"] = series
+    DOCS_RETRIEVED.inc(len(docs), series=series)
+    return docs
+
+def search_many_series(series_list: list[str], query_vector: list[float], k: int = 2,
+                       timeout: float | None = None) -> tuple[list[Document], dict]:
+    """
+    并发检索多个系列，每个系列独立超时、独立容错。
+
+    返回:
+        (docs, errors): docs 按 series_list 的顺序拼接；errors 为 {系列: 错误信息}
+    """
+    timeout = config.RETRIEVAL_TIMEOUT if timeout is None else timeout
+    errors = {}
+    # 单一系列也经过线程池，以便同样受超时约束
+    executor = _get_executor()
+    futures = [(s, executor.submit(search_series, s, query_vector, k)) for s in series_list]
+    # 所有系列同时开始，因此共享同一个截止时间即等价于每个系列各自的超时
+    deadline = time.monotonic() + timeout
+    all_docs = []
+    for s, future in futures:
+        try:
+            all_docs.extend(future.result(timeout=max(0.0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            future.cancel()
+            errors[s] = f"timed out after {timeout}s"
+        except Exception as e:
+            errors[s] = str(e)
+    return all_docs, errors
@@ -0,0 +1,111 @@
+"""
+表驱动的路由引擎
+
+别名表和意图关键词编译为一个带单词边界的正则，对问题只做一次扫描即可得到
+涉及的系列和意图。新增产品线只需在 SERIES_ALIASES 中添加一行。
+"""
+import re
+
+# 型号/别名 → 系列（顺序即多系列结果中的顺序，也是单系列时的优先级）
+SERIES_ALIASES = {
+    "700": ["ecu-700", "700 series", "700", "ecu-750", "750", "legacy"],
+    "800B": ["ecu-800 base", "800 base", "ecu-800b", "800b", "ecu-800", "800 series", "800", "ecu-850", "850", "base"],
+    "800P": ["ecu-800 plus", "800 plus", "800p", "ecu-850b", "850b", "plus", "ai enhanced"],
+}
+
+# 意图关键词
+INTENT_KEYWORDS = {
+    # 比较意图：与 >= 2 个系列同时出现时查询多个系列
+    "comparison": [
+        "compare", "compared", "comparing", "comparison", "difference", "differences", "differ",
+        "vs", "versus", "between", "contrast", "and"
+    ],
+    # 通用查询：未指定型号时查询所有系列
+    "general": [
+        "which", "all", "every", "each", "models", "how many", "across",
+        "best", "most", "least", "highest", "lowest", "largest", "smallest", "fastest", "slowest", "harshest"
+    ],
+}
+
+def _normalize(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+def _trie_regex(phrases) -> str:
+    """
+    把短语集合编译为前缀树形状的正则（公共前缀只匹配一次），
+    效果接近 Aho–Corasick：匹配耗时几乎不随短语数增长。
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def _to_regex(node) -> str:
+        # 各分支首字符互不相同；短语结尾处的后缀是贪婪可选的，因此同一位置优先匹配最长的短语
+        branches = [(ch, _to_regex(child)) for ch, child in node.items() if ch]
+        alternatives = [(r"\s+" if ch == " " else re.escape(ch)) + sub for ch, sub in branches]
+        if not alternatives:
+            return ""
+        body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return _to_regex(trie)
+
+class Router:
+    """把别名表编译为单个正则，并把匹配到的短语映射为 ("series", 系列) 或 ("intent", 意图)"""
+
+    def __init__(self, series_aliases: dict, intent_keywords: dict):
+        self.series = list(series_aliases)
+        self._labels = {}
+        for series, aliases in series_aliases.items():
+            for alias in aliases:
+                self._labels[_normalize(alias)] = ("series", series)
+        for intent, keywords in intent_keywords.items():
+            for kw in keywords:
+                # 意图词不覆盖型号别名
+                self._labels.setdefault(_normalize(kw), ("intent", intent))
+
+        self._pattern = re.compile(r"\b" + _trie_regex(self._labels) + r"\b", re.IGNORECASE)
+
+    def scan(self, question: str) -> tuple[dict, set]:
+        """单次扫描问题，返回 ({系列: 首个匹配短语}, {意图})"""
+        matched_series = {}
+        intents = set()
+        for m in self._pattern.finditer(question):
+            kind, label = self._labels[_normalize(m.group())]
+            if kind == "series":
+                matched_series.setdefault(label, m.group())
+            else:
+                intents.add(label)
+        return matched_series, intents
+
+    def route(self, question: str) -> tuple[str, str]:
+        """
+        返回 (路由结果, 原因)。路由结果为单个系列、"multi:系列1,系列2" 或 "unknown"。
+        """
+        matched, intents = self.scan(question)
+        found = [s for s in self.series if s in matched]
+
+        # 处理比较问题
+        if "comparison" in intents and len(found) >= 2:
+            return f"multi:{','.join(found)}", "comparison detected"
+
+        # 处理通用查询（需要跨多个系列查找）
+        if "general" in intents:
+            if len(found) > 1:
+                return f"multi:{','.join(found)}", "general query across series"
+            if not found:
+                return f"multi:{','.join(self.series)}", "general query across ALL series"
+
+        # 单一系列查询（多个系列但无比较意图时按表中顺序取第一个）
+        if found:
+            return found[0], f"matched: {matched[found[0]]}"
+        return "unknown", "no match found"
+
+router = Router(SERIES_ALIASES, INTENT_KEYWORDS)
+
+def route(question: str) -> tuple[str, str]:
+    """使用默认别名表路由问题"""
+    return router.route(question)
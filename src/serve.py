@@ -0,0 +1,184 @@
+"""
+多 worker 服务入口（preload-before-fork）
+
+父进程先加载嵌入模型、编译图、规格索引和向量索引，再 fork 出 N 个 uvicorn worker，
+worker 以写时复制方式共享这些内存页，所有 worker 共用同一个监听 socket。
+每个 worker 分到可用 CPU 数（亲和性与 CFS 配额）/ worker 数 个推理线程（torch 或 ONNX Runtime），避免线程超额订阅。
+
+用法:
+    python src/serve.py [--workers 8] [--threads 4] [--host 0.0.0.0] [--port 8000]
+    ecu-agent-serve ...
+"""
+import argparse
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+# 允许以脚本方式运行（python src/serve.py）
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+# HuggingFace tokenizers 的线程池不能跨 fork 使用
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import uvicorn
+import config
+
+def _cfs_quota_cpus() -> float | None:
+    """容器的 CFS CPU 配额（cgroup v2 cpu.max，或 v1 cfs_quota_us / cfs_period_us），未设置时返回 None"""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+def available_cpus() -> int:
+    """
+    本进程实际可用的 CPU 数：CPU 亲和性（taskset / cpuset）与 CFS 配额中较小者。
+
+    os.cpu_count() 返回宿主机的核数，在容器中会高估线程预算。
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = _cfs_quota_cpus()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+def preload() -> dict:
+    """在父进程中加载可以安全跨 fork 共享的组件"""
+    from agent import warmup_ecu_agent
+    from embeddings import get_embedding_service
+
+    # 父进程单线程预热：不在 fork 前启动 torch/OpenMP/ORT 线程池（子进程无法继承）
+    get_embedding_service().set_num_threads(1)
+    # mmap 快照 / NumPy 索引可以共享；Chroma 的 SQLite 连接不能跨 fork，由各 worker 自己打开。
+    # LLM 客户端的连接池同理，在 worker 的 lifespan 中预热。
+    return warmup_ecu_agent(warmup_llm=False, warmup_indexes=config.VECTOR_BACKEND == "numpy")
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(sock: socket.socket, threads: int, log_level: str):
+    """子进程：设置线程预算后在共享 socket 上运行 uvicorn"""
+    from api import app
+    from embeddings import get_embedding_service
+
+    get_embedding_service().set_num_threads(threads)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+def spawn_worker(sock: socket.socket, threads: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # 恢复默认信号处理，由 uvicorn 自己接管 SIGINT/SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(sock, threads, log_level)
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            # 不能返回到父进程的代码路径
+            os._exit(code)
+    return pid
+
+def serve(args) -> int:
+    workers = max(1, args.workers)
+    threads = args.threads or max(1, available_cpus() // workers)
+
+    start = time.perf_counter()
+    # 先导入 api 模块（agent、路由等；LLM 客户端是惰性创建的，由各 worker 自己构建），fork 后各 worker 无需再导入
+    import api  # noqa: F401
+    report = preload()
+    failed = [name for name, step in report.items() if not step["ok"]]
+    print(f"✅ Preloaded in {time.perf_counter() - start:.2f}s"
+          + (f", failed steps: {failed}" if failed else ""))
+
+    sock = bind_socket(args.host, args.port)
+    print(f"🚀 Serving on {args.host}:{args.port} with {workers} workers x {threads} embedding threads")
+
+    children = {}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    # pid -> (worker 槽位, 启动时间)；每个槽位连续崩溃时按指数退避重启，超过上限后整体退出
+    for slot in range(workers):
+        children[spawn_worker(sock, threads, args.log_level)] = (slot, time.monotonic())
+    restarts = [0] * workers
+    exit_code = 0
+
+    # 监督 worker：意外退出时从（仍保持预加载状态的）父进程重新 fork
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot, started = children.pop(pid, (None, 0.0))
+        if stopping or slot is None:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        # 稳定运行过一段时间后再退出的 worker 不计入连续崩溃次数
+        if time.monotonic() - started >= config.SERVE_RESTART_RESET:
+            restarts[slot] = 0
+        if restarts[slot] >= config.SERVE_MAX_RESTARTS:
+            print(f"❌ Worker {pid} (slot {slot}) exited with status {code} after "
+                  f"{restarts[slot]} restarts; shutting down")
+            exit_code = 1
+            _stop(None, None)
+            continue
+        delay = min(config.SERVE_RESTART_BACKOFF * 2 ** restarts[slot], 60.0)
+        restarts[slot] += 1
+        print(f"⚠️ Worker {pid} (slot {slot}) exited with status {code}, "
+              f"restart {restarts[slot]}/{config.SERVE_MAX_RESTARTS} in {delay:.0f}s")
+        time.sleep(delay)
+        if stopping:
+            continue
+        children[spawn_worker(sock, threads, args.log_level)] = (slot, time.monotonic())
+
+    sock.close()
+    return exit_code
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="ecu-agent-serve", description="Serve the ECU agent API with preforked workers")
+    parser.add_argument("--host", default=config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS, help="number of forked uvicorn workers")
+    parser.add_argument("--threads", type=int, default=config.WORKER_THREADS,
+                        help="embedding intra-op threads per worker (0 = available CPUs / workers)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    return serve(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+规格表精确查询
+
+入库时把手册中的规格表整理为 (型号, 规范化参数) → 值 的内存索引。
+问题明确指向一个已知型号的一个参数时（如 "RAM of the ECU-850"），直接从表中作答，
+跳过向量检索和 LLM。
+"""
+import json
+import os
+import re
+import threading
+from pathlib import Path
+import config
+from utils import iter_docs_from_markdown
+
+# 规范化参数 → 可能的叫法（表格参数名和问题中的说法都按此归一）
+# 不收录有歧义的单词（cpu / flash / temp / power / can 在问题里常有别的意思）
+PARAMETER_ALIASES = {
+    "processor": ["processor", "clock speed"],
+    "npu": ["npu", "ai accelerator"],
+    "memory": ["memory (ram)", "memory", "ram"],
+    "storage": ["storage", "emmc", "storage capacity"],
+    "can": ["can interface", "can bus"],
+    "ethernet": ["ethernet"],
+    "voltage": ["operating voltage", "voltage"],
+    "power": ["power consumption", "power draw", "current draw"],
+    "temperature": ["operating temperature", "operating temp.", "operating temp", "temperature"],
+    "connectors": ["connectors", "connector"],
+}
+
+# 只按大小写精确匹配的叫法："CAN" 是总线，"Can the ECU-850 ..." 不是
+CASE_SENSITIVE_ALIASES = {
+    "CAN": "can",
+}
+
+# 问题中出现这些说法时不是单纯的规格查询（操作步骤、比较等），交给 RAG 流程
+NON_LOOKUP_PHRASES = [
+    "how do", "how to", "how can", "enable", "configure", "install", "why", "compare", "difference",
+    "differences", "versus", "vs", "between", "and", "which", "all"
+]
+
+_MODEL_PATTERN = re.compile(r"\b(?:ecu[-\s]?)?(\d{3}[a-z]?)\b", re.IGNORECASE)
+
+def _phrase_alternatives(phrases) -> str:
+    return "|".join(sorted({re.escape(p) for p in phrases}, key=len, reverse=True))
+
+def _phrase_pattern(phrases) -> re.Pattern:
+    return re.compile(r"(?<!\w)(?:" + _phrase_alternatives(phrases) + r")(?!\w)", re.IGNORECASE)
+
+_PARAMETER_ALTERNATIVES = (
+    _phrase_alternatives(a for aliases in PARAMETER_ALIASES.values() for a in aliases)
+    + "|" + "|".join(f"(?-i:{re.escape(a)})" for a in CASE_SENSITIVE_ALIASES)
+)
+_PARAMETER_PATTERN = re.compile(r"(?<!\w)(?:" + _PARAMETER_ALTERNATIVES + r")(?!\w)", re.IGNORECASE)
+_PARAMETER_LOOKUP = {a: param for param, aliases in PARAMETER_ALIASES.items() for a in aliases}
+_PARAMETER_LOOKUP.update({a.lower(): param for a, param in CASE_SENSITIVE_ALIASES.items()})
+_NON_LOOKUP_PATTERN = _phrase_pattern(NON_LOOKUP_PHRASES)
+
+# 只有这些"查询规格"句式才走快速路径，参数和型号必须出现在句式中对应的位置
+_P = r"(?P<param>" + _PARAMETER_ALTERNATIVES + r")"
+_M = r"(?P<model>(?:ecu[-\s]?)?\d{3}[a-z]?)\b"
+_QUALIFIER = r"(?:(?:max(?:imum)?|min(?:imum)?|rated|typical|supported)\s+)?"
+LOOKUP_SHAPES = [
+    # What is / What's / What are the <param> of|for <model>
+    re.compile(r"^\s*what(?:\s+is|'s|\s+are)\s+the\s+" + _QUALIFIER + _P + r"\s+(?:of|for|on|in)\s+(?:the\s+)?" + _M,
+               re.IGNORECASE),
+    # What is the <model>'s <param>
+    re.compile(r"^\s*what(?:\s+is|'s)\s+(?:the\s+)?" + _M + r"'s\s+" + _QUALIFIER + _P + r"(?!\w)", re.IGNORECASE),
+    # How much <param> does the <model> have
+    re.compile(r"^\s*how\s+much\s+" + _P + r"\s+does\s+(?:the\s+)?" + _M + r"\s+(?:have|use|draw|need)\b",
+               re.IGNORECASE),
+    # What <param> does the <model> have|use
+    re.compile(r"^\s*what\s+" + _P + r"\s+does\s+(?:the\s+)?" + _M + r"\s+(?:have|use)\b", re.IGNORECASE),
+]
+
+def normalize_model(text: str) -> str | None:
+    """从标题或问题片段中提取型号键，如 "Full Technical Specifications: ECU-850b" → "ecu-850b" """
+    m = _MODEL_PATTERN.search(text)
+    return f"ecu-{m.group(1).lower()}" if m else None
+
+def normalize_parameter(text: str) -> str | None:
+    """把表格参数名归一为规范化参数，如 "Memory (RAM)" → "memory" """
+    m = _PARAMETER_PATTERN.search(text)
+    return _PARAMETER_LOOKUP[m.group().lower()] if m else None
+
+class SpecIndex:
+    """(型号, 规范化参数) → 规格条目"""
+
+    def __init__(self, entries: dict | None = None):
+        self._entries = entries or {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(model: str, parameter: str) -> str:
+        return f"{model}|{parameter}"
+
+    def add(self, model_title: str, parameter: str, value: str, series: str, source: str):
+        model = normalize_model(model_title)
+        param = normalize_parameter(parameter)
+        if model is None or param is None:
+            return
+        display = re.search(r"ECU-\d{3}[a-z]?", model_title, re.IGNORECASE)
+        self._entries.setdefault(self._key(model, param), {
+            "model": display.group() if display else model.upper(),
+            "parameter": parameter,
+            "value": value,
+            "series": series,
+            "source": source
+        })
+
+    def get(self, model: str, parameter: str) -> dict | None:
+        return self._entries.get(self._key(model, parameter))
+
+    def lookup(self, question: str) -> dict | None:
+        """
+        问题是"查询规格"句式（见 LOOKUP_SHAPES），且恰好指向一个已知型号的一个参数时返回对应条目，
+        否则返回 None（交给 RAG 流程）
+        """
+        if _NON_LOOKUP_PATTERN.search(question):
+            return None
+        models = {f"ecu-{m.group(1).lower()}" for m in _MODEL_PATTERN.finditer(question)}
+        params = {_PARAMETER_LOOKUP[m.group().lower()] for m in _PARAMETER_PATTERN.finditer(question)}
+        if len(models) != 1 or len(params) != 1:
+            return None
+        for shape in LOOKUP_SHAPES:
+            m = shape.search(question)
+            if m:
+                return self.get(normalize_model(m.group("model")), _PARAMETER_LOOKUP[m.group("param").lower()])
+        return None
+
+    @classmethod
+    def from_manuals(cls, manuals: dict) -> "SpecIndex":
+        """从手册的规格表 chunk 构建索引；manuals 为 {路径: 系列}"""
+        index = cls()
+        for path, series in manuals.items():
+            for doc in iter_docs_from_markdown(str(path)):
+                if "parameter" not in doc.metadata:
+                    continue
+                value = doc.page_content.rsplit("\nValue:", 1)[-1]
+                index.add(doc.metadata["model"], doc.metadata["parameter"], value, series, doc.metadata["source"])
+        return index
+
+    def save(self, path: Path):
+        tmp = Path(path).with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SpecIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+def format_answer(entry: dict) -> str:
+    return f"The {entry['parameter']} of the {entry['model']} is {entry['value']}."
+
+_spec_index = None
+_spec_index_lock = threading.Lock()
+
+def get_spec_index() -> SpecIndex:
+    """加载离线构建的规格索引；缺失时按配置现场构建或退化为空索引"""
+    global _spec_index
+    if _spec_index is None:
+        with _spec_index_lock:
+            if _spec_index is None:
+                if config.SPEC_INDEX_PATH.exists():
+                    _spec_index = SpecIndex.load(config.SPEC_INDEX_PATH)
+                elif config.INDEX_AUTO_BUILD:
+                    from indexing import discover_manuals
+                    _spec_index = SpecIndex.from_manuals(discover_manuals(config.DATA_DIR))
+                else:
+                    print(f"⚠️ Spec index not found at {config.SPEC_INDEX_PATH}; spec fast path disabled")
+                    _spec_index = SpecIndex()
+    return _spec_index
+
+def reset_spec_index():
+    """丢弃已加载的规格索引（离线重建后），下次使用时重新加载"""
+    global _spec_index
+    with _spec_index_lock:
+        _spec_index = None
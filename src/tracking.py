@@ -0,0 +1,190 @@
+"""
+非阻塞、批量的 MLflow 交互日志
+
+请求路径只把交互记录放入有界内存队列；后台线程按批取出，
+每批一次 log_batch（指标）+ 一次 log_dict（完整记录），写入同一个长期存在的 MLflow run。
+队列满时按策略丢弃或采样，进程退出时冲刷剩余记录。
+"""
+import atexit
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import config
+
+_STOP = object()
+
+class InteractionLogger:
+    """有界队列 + 后台线程，按批写入 MLflow"""
+
+    def __init__(self, experiment: str, queue_size: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 5.0, policy: str = "drop", sample_rate: float = 0.1):
+        if policy not in ("drop", "sample"):
+            raise ValueError(f"Unknown tracking policy: {policy!r} (expected 'drop' or 'sample')")
+        self.experiment = experiment
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._seq = 0
+        self._seq_lock = threading.Lock()
+        self._client = None
+        self._run_id = None
+        self._batches = 0
+        self.logged = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.failed = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="ecu-mlflow-logger", daemon=True)
+        self._thread.start()
+
+    def log(self, record: dict) -> bool:
+        """放入队列，不阻塞；返回是否被接收"""
+        if self._closed:
+            return False
+        if self.policy == "sample" and self._queue.qsize() >= self._queue.maxsize // 2:
+            if random.random() >= self.sample_rate:
+                self.sampled_out += 1
+                return False
+        with self._seq_lock:
+            self._seq += 1
+            record = {"step": self._seq, "timestamp_ms": int(time.time() * 1000), **record}
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _worker(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._write(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or (batch and time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+    def _ensure_run(self):
+        if self._run_id is None:
+            # mlflow 只在后台线程中导入和使用
+            from mlflow.tracking import MlflowClient
+            self._client = MlflowClient()
+            experiment = self._client.get_experiment_by_name(self.experiment)
+            experiment_id = experiment.experiment_id if experiment else self._client.create_experiment(self.experiment)
+            run = self._client.create_run(
+                experiment_id,
+                run_name=f"interactions-{socket.gethostname()}-{os.getpid()}",
+                tags={"ecu.logger": "batched"}
+            )
+            self._run_id = run.info.run_id
+        return self._client, self._run_id
+
+    def _write(self, batch: list[dict]):
+        if not batch:
+            return
+        try:
+            from mlflow.entities import Metric
+            client, run_id = self._ensure_run()
+            metrics = []
+            for r in batch:
+                for key in ("latency_ms", "docs_retrieved", "answer_length"):
+                    if r.get(key) is not None:
+                        metrics.append(Metric(key, float(r[key]), r["timestamp_ms"], r["step"]))
+                for key in ("spec_hit", "cache_hit", "error"):
+                    metrics.append(Metric(key, 1.0 if r.get(key) else 0.0, r["timestamp_ms"], r["step"]))
+            client.log_batch(run_id, metrics=metrics)
+            self._batches += 1
+            client.log_dict(run_id, batch, f"interactions/batch-{self._batches:06d}.json")
+            self.logged += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"⚠️ MLflow interaction logging failed for {len(batch)} records: {e}")
+
+    def close(self, timeout: float = 30.0):
+        """冲刷队列中剩余的记录并结束 run"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._run_id is not None:
+            try:
+                self._client.set_terminated(self._run_id)
+            except Exception as e:
+                print(f"⚠️ Failed to close MLflow run: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "logged": self.logged,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "failed": self.failed
+        }
+
+_logger = None
+_logger_lock = threading.Lock()
+
+def get_interaction_logger() -> InteractionLogger | None:
+    """返回进程内的交互日志器；关闭跟踪时返回 None"""
+    global _logger
+    if not config.TRACKING_ENABLED:
+        return None
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = InteractionLogger(
+                    experiment=config.TRACKING_EXPERIMENT,
+                    queue_size=config.TRACKING_QUEUE_SIZE,
+                    batch_size=config.TRACKING_BATCH_SIZE,
+                    flush_interval=config.TRACKING_FLUSH_INTERVAL,
+                    policy=config.TRACKING_POLICY,
+                    sample_rate=config.TRACKING_SAMPLE_RATE
+                )
+                atexit.register(_logger.close)
+    return _logger
+
+def _reset_logger_after_fork():
+    # 后台写入线程不会被 fork 继承；子进程在首次记录时创建自己的日志器
+    global _logger
+    _logger = None
+
+os.register_at_fork(after_in_child=_reset_logger_after_fork)
+
+def log_interaction(question: str, state: dict, latency_ms: float, error: str | None = None):
+    """记录一次问答交互（立即返回）"""
+    logger = get_interaction_logger()
+    if logger is None:
+        return
+    answer = state.get("final_answer", "")
+    logger.log({
+        "question": question,
+        "series_to_query": state.get("series_to_query"),
+        "answer": answer,
+        "answer_length": len(answer),
+        "docs_retrieved": len(state.get("retrieved_docs", [])),
+        "sources": [d.metadata.get("source") for d in state.get("retrieved_docs", [])],
+        "spec_hit": bool(state.get("spec_hit")),
+        "cache_hit": bool(state.get("cache_hit")),
+        "latency_ms": latency_ms,
+        "error": error
+    })
+
+def close_interaction_logger():
+    if _logger is not None:
+        _logger.close()
@@ -1,83 +1,157 @@
 import re
+from pathlib import Path
 from langchain_core.documents import Document
 
-def load_docs_from_markdown(file_path: str) -> list[Document]:
-    with open(file_path, encoding="utf-8") as f:
-        content = f.read()
+# 二级标题行（"## 标题"），文件第一行不视为标题
+SECTION_HEADER = re.compile(r'##\s+(.+)')
+# 表格分隔行（如 |---|:---:|）
+TABLE_SEPARATOR = re.compile(r'\|\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|')
+
+def _series_name(file_path: str) -> str:
     # 提取 Series 名称（从文件名推断）
     if "700" in file_path:
-        series_name = "ECU-700"
-    elif "800" and "base" in file_path.lower():
-        series_name = "ECU-800B"
-    elif "800" and "plus" in file_path.lower():
-        series_name = "ECU-800P"
-    else:
-        series_name = "Unknown"
-    
-    docs = []
-    sections = re.split(r'\n##\s+(.+)', content)    
-
-    for i in range(1, len(sections), 2):
-        title = sections[i].strip()
-        body = sections[i + 1].strip() if i + 1 < len(sections) else ""
-        if not title or "series" in title.lower():
-            continue
-        ## 加入表格逻辑细分
-        if "|" in body and "**" in body:
-            # 尝试提取表格部分
-            table_lines = []
-            non_table_lines = []
-            in_table = False
-            for line in body.split("\n"):
-                stripped = line.strip()
-                if stripped.startswith("|") and stripped.endswith("|"):
-                    table_lines.append(stripped)
-                    in_table = True
-                else:
-                    if in_table and (stripped == "" or all(c in "-| " for c in stripped)):
-                        # 跳过表格分隔线（如 |---|---|)
-                        continue                    
-                    non_table_lines.append(line)
-                    in_table = False  # 非表格内容重置状态
-            # === 1. 处理表格行：每行一个 chunk ===
-            if table_lines:
-                # 过滤掉表头分隔行（通常含 ---）
-                data_rows = [
-                    row for row in table_lines
-                    if not re.match(r'\|\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|', row)
-                ]
-                # 跳过表头（第一行）
-                for row in data_rows[1:]:
-                    cells = [cell.strip().replace("**", "").strip() for cell in row.split("|")[1:-1]]
-                    if len(cells) >= 2:
-                        param_name = cells[0]
-                        param_value = cells[1]
-                        if param_name and param_value:
-                            text = f"Series:{series_name}\nModel:{title}\nParameter:{param_name}\nValue:{param_value}"
-                            docs.append(Document(
-                                page_content=text,
-                                metadata={
-                                    "source": file_path,
-                                    "model": title,
-                                    "parameter": param_name
-                                }
-                            ))
-            # === 2. 保留非表格描述（如软件配置）作为单独 chunk ===
-            non_table_body = "\n".join(non_table_lines).strip()
+        return "ECU-700"
+    if "base" in file_path.lower():
+        return "ECU-800B"
+    if "plus" in file_path.lower():
+        return "ECU-800P"
+    return "Unknown"
+
+class _Section:
+    """
+    正在解析的一个二级标题小节。
+
+    含表格（同时出现 "|" 和 "**"）的小节：每个表格数据行一个 chunk，一完成就产出；
+    其余描述文字在小节结束时合并为一个 chunk。不含表格的小节整体作为一个 chunk。
+    """
+
+    def __init__(self, title: str, series_name: str, file_path: str):
+        self.title = title
+        self.series_name = series_name
+        self.file_path = file_path
+        self.lines = []              # 原始正文行（判定为表格小节后不再需要）
+        self.non_table_lines = []
+        self.pending_rows = []       # 判定为表格小节之前暂存的表格行
+        self.has_pipe = False
+        self.has_bold = False
+        self.in_table = False
+        self.header_skipped = False  # 小节中第一个数据行是表头
+
+    @property
+    def is_table_section(self) -> bool:
+        return self.has_pipe and self.has_bold
+
+    def _row_doc(self, row: str):
+        if TABLE_SEPARATOR.match(row):
+            return None
+        if not self.header_skipped:
+            # 跳过表头（第一行）
+            self.header_skipped = True
+            return None
+        cells = [cell.strip().replace("**", "").strip() for cell in row.split("|")[1:-1]]
+        if len(cells) < 2 or not cells[0] or not cells[1]:
+            return None
+        param_name, param_value = cells[0], cells[1]
+        return Document(
+            page_content=f"Series:{self.series_name}\nModel:{self.title}\nParameter:{param_name}\nValue:{param_value}",
+            metadata={
+                "source": self.file_path,
+                "model": self.title,
+                "parameter": param_name
+            }
+        )
+
+    def add_line(self, line: str):
+        """加入一行正文，产出因此完成的表格行 chunk"""
+        was_table_section = self.is_table_section
+        self.has_pipe = self.has_pipe or "|" in line
+        self.has_bold = self.has_bold or "**" in line
+        if not was_table_section:
+            self.lines.append(line)
+
+        stripped = line.strip()
+        if stripped.startswith("|") and stripped.endswith("|"):
+            self.in_table = True
+            if self.is_table_section:
+                yield from self._flush_pending()
+                doc = self._row_doc(stripped)
+                if doc is not None:
+                    yield doc
+            else:
+                self.pending_rows.append(stripped)
+        elif self.in_table and (stripped == "" or all(c in "-| " for c in stripped)):
+            # 跳过表格后的空行和分隔线
+            pass
+        else:
+            self.non_table_lines.append(line)
+            self.in_table = False  # 非表格内容重置状态
+
+        if self.is_table_section and not was_table_section:
+            # 刚刚判定为表格小节：暂存的表格行可以产出，原始正文不再需要
+            yield from self._flush_pending()
+            self.lines = []
+
+    def _flush_pending(self):
+        rows, self.pending_rows = self.pending_rows, []
+        for row in rows:
+            doc = self._row_doc(row)
+            if doc is not None:
+                yield doc
+
+    def finish(self):
+        """小节结束：产出描述文字 chunk（或整个小节）"""
+        if not self.title or "series" in self.title.lower():
+            return
+        if self.is_table_section:
+            # 保留非表格描述（如软件配置）作为单独 chunk
+            non_table_body = "\n".join(self.non_table_lines).strip()
             if non_table_body:
-                text = f"Series: {series_name}\nModel: {title}\n\n{non_table_body}"
-                docs.append(Document(
-                    page_content=text,
-                    metadata={"source": file_path, "model": title}
-                ))
+                yield Document(
+                    page_content=f"Series: {self.series_name}\nModel: {self.title}\n\n{non_table_body}",
+                    metadata={"source": self.file_path, "model": self.title}
+                )
         else:
             # 无表格：保留原始整块 chunk（兼容 ECU-700）
-            text = f"Series: {series_name}\nModel: {title}\n\n{body}"
-            docs.append(Document(
-                page_content=text,
-                metadata={"source": file_path, "model": title}
-            ))        
-    return docs
+            body = "\n".join(self.lines).strip()
+            yield Document(
+                page_content=f"Series: {self.series_name}\nModel: {self.title}\n\n{body}",
+                metadata={"source": self.file_path, "model": self.title}
+            )
+
+def iter_docs_from_markdown(file_path: str):
+    """
+    逐行流式解析 markdown 手册，每当一个表格行或小节完成时产出 Document。
+
+    内存占用只与当前小节相关，与文件大小无关。
+    """
+    series_name = _series_name(file_path)
+    section = None
+    with open(file_path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.rstrip("\n")
+            header = SECTION_HEADER.match(line) if line_no > 0 else None
+            if header:
+                if section is not None:
+                    yield from section.finish()
+                title = header.group(1).strip()
+                section = _Section(title, series_name, file_path)
+                continue
+            if section is None:
+                continue  # 第一个标题之前的内容不入库
+            if not section.title or "series" in section.title.lower():
+                continue  # 被跳过的小节无需解析
+            yield from section.add_line(line)
+    if section is not None:
+        yield from section.finish()
+
+def iter_docs_from_directory(root: str, pattern: str = "*.md"):
+    """递归遍历目录树中的 markdown 手册，流式产出 Document"""
+    for path in sorted(Path(root).rglob(pattern)):
+        if path.is_file():
+            yield from iter_docs_from_markdown(str(path))
+
+def load_docs_from_markdown(file_path: str) -> list[Document]:
+    return list(iter_docs_from_markdown(file_path))
 
 ## test
 # from pathlib import Path
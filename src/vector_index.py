@@ -0,0 +1,210 @@
+"""
+进程内的 NumPy 向量索引
+
+所有 chunk 的嵌入存放在一个连续矩阵中（可量化为 float16 或 int8），
+查询时按行分块做矩阵乘法打分、argpartition 取 top-k，绕开 Chroma 的 SQLite 和元数据反序列化。
+float16 / int8 矩阵每次只把一个块升为 float32，单次查询的临时内存与语料大小无关；
+带系列过滤时只读取该系列的行。
+对外提供与 Chroma 相同的检索接口，rag 模块可以直接替换。
+
+索引可以保存为快照目录，服务进程以只读 mmap 方式加载：
+    header.json        格式版本、精度、条数、维度、对应的 manifest 哈希
+    embeddings.npy     向量矩阵（int8 时另有每行缩放系数 scale.npy）
+    texts.bin          所有 chunk 文本的 UTF-8 拼接
+    text_offsets.npy   第 i 个 chunk 的文本为 texts.bin[offsets[i]:offsets[i+1]]
+    metadata.json      元数据表 {"columns": [...], "rows": [[...], ...]}
+加载耗时与语料大小基本无关，同一台机器上的多个 worker 通过页缓存共享同一份物理内存。
+"""
+import json
+import mmap
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from langchain_core.documents import Document
+
+DTYPES = ("float32", "float16", "int8")
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = "header.json"
+# 打分时每块的行数：float16 / int8 每块临时升为 float32，约 SCORE_BLOCK_ROWS × dim × 4 字节
+SCORE_BLOCK_ROWS = 2048
+
+class _TextBlob:
+    """按偏移量从 mmap 的文本块中按需解码 chunk 文本，表现为只读序列"""
+
+    def __init__(self, path: Path, offsets: np.ndarray):
+        self._offsets = offsets
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[int(self._offsets[i]):int(self._offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+def read_snapshot_header(path: Path) -> dict | None:
+    """快照不存在或格式版本不符时返回 None"""
+    header_path = Path(path) / SNAPSHOT_HEADER
+    if not header_path.exists():
+        return None
+    with open(header_path, encoding="utf-8") as f:
+        header = json.load(f)
+    if header.get("version") != SNAPSHOT_VERSION:
+        return None
+    return header
+
+class NumpyVectorIndex:
+
+    def __init__(self, texts: list[str], metadatas: list[dict], embeddings, dtype: str = "float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {DTYPES}")
+        self.dtype = dtype
+        self.texts = list(texts)
+        self.metadatas = [dict(m or {}) for m in metadatas]
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(self.texts), -1)
+        if dtype == "int8":
+            # 每行对称量化：x ≈ q * scale，scale = max|x| / 127
+            scale = np.abs(matrix).max(axis=1, initial=0.0) / 127.0
+            scale[scale == 0] = 1.0
+            self._matrix = np.round(matrix / scale[:, None]).astype(np.int8)
+            self._scale = scale.astype(np.float32)
+        else:
+            self._matrix = np.ascontiguousarray(matrix.astype(dtype))
+            self._scale = None
+        self._index_series()
+
+    def _index_series(self):
+        series = np.array([m.get("series", "") for m in self.metadatas], dtype=object)
+        self._series_rows = {s: np.flatnonzero(series == s) for s in set(series.tolist())}
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, dtype: str = "float16", series: str | None = None):
+        """从 Chroma 集合读出全部 chunk 和向量；series 不为空时为每个 chunk 打上该系列标签"""
+        data = vectorstore.get(include=["documents", "metadatas", "embeddings"])
+        metadatas = [dict(m or {}) for m in data["metadatas"]]
+        if series is not None:
+            for metadata in metadatas:
+                metadata["series"] = series
+        return cls(data["documents"], metadatas, data["embeddings"], dtype)
+
+    def save(self, path: Path, manifest_sha256: str | None = None):
+        """
+        写入快照目录。先写到临时目录再整体替换：已经 mmap 旧快照的进程仍持有旧文件，不受影响。
+        """
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        np.save(tmp / "embeddings.npy", self._matrix)
+        if self._scale is not None:
+            np.save(tmp / "scale.npy", self._scale)
+        encoded = [text.encode("utf-8") for text in self.texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+        with open(tmp / "texts.bin", "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(tmp / "text_offsets.npy", offsets)
+
+        columns = sorted({key for metadata in self.metadatas for key in metadata})
+        rows = [[metadata.get(key) for key in columns] for metadata in self.metadatas]
+        with open(tmp / "metadata.json", "w", encoding="utf-8") as f:
+            json.dump({"columns": columns, "rows": rows}, f, ensure_ascii=False, separators=(",", ":"))
+
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "dtype": self.dtype,
+            "count": len(self),
+            "dim": int(self._matrix.shape[1]) if self._matrix.ndim == 2 else 0,
+            "manifest_sha256": manifest_sha256
+        }
+        with open(tmp / SNAPSHOT_HEADER, "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=2)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """以只读 mmap 方式加载快照：向量和文本都不复制到进程私有内存"""
+        path = Path(path)
+        header = read_snapshot_header(path)
+        if header is None:
+            raise FileNotFoundError(f"No index snapshot at {path}")
+        index = cls.__new__(cls)
+        index.dtype = header["dtype"]
+        index._matrix = np.load(path / "embeddings.npy", mmap_mode="r")
+        index._scale = np.load(path / "scale.npy") if index.dtype == "int8" else None
+        index.texts = _TextBlob(path / "texts.bin", np.load(path / "text_offsets.npy", mmap_mode="r"))
+        with open(path / "metadata.json", encoding="utf-8") as f:
+            table = json.load(f)
+        columns = table["columns"]
+        index.metadatas = [
+            {key: value for key, value in zip(columns, row) if value is not None} for row in table["rows"]
+        ]
+        index._index_series()
+        return index
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes + (self._scale.nbytes if self._scale is not None else 0)
+
+    def _rows(self, filter: dict | None):
+        """支持 rag.series_filter 生成的两种条件：{"series": s} 和 {"series": {"$in": [...]}}"""
+        if not filter:
+            return None
+        condition = filter["series"]
+        wanted = condition["$in"] if isinstance(condition, dict) else [condition]
+        rows = [self._series_rows[s] for s in wanted if s in self._series_rows]
+        return np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+
+    def _scores(self, query_vectors, rows) -> np.ndarray:
+        """
+        返回 (查询数, 候选行数) 的余弦得分；rows 为 None 时候选为全部行。
+        按块计算：float32 的连续块不复制，其它精度每块复制一次并升为 float32。
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        count = len(self) if rows is None else len(rows)
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, count)
+            block_rows = slice(start, stop) if rows is None else rows[start:stop]
+            block = self._matrix[block_rows].astype(np.float32, copy=False)
+            np.matmul(queries, block.T, out=scores[:, start:stop])
+            if self._scale is not None:
+                scores[:, start:stop] *= self._scale[block_rows]
+        return scores
+
+    def _top_k(self, scores: np.ndarray, k: int, rows) -> list[tuple[Document, float]]:
+        """scores 与候选行一一对应（见 _scores）"""
+        positions = np.arange(len(scores))
+        if positions.size > k:
+            positions = positions[np.argpartition(-scores, k - 1)[:k]]
+        positions = positions[np.argsort(-scores[positions], kind="stable")]
+        ids = positions if rows is None else rows[positions]
+        # 向量均已归一化：平方 L2 距离 = 2 - 2·cos，与 Chroma 默认的距离口径一致
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i])), float(2.0 - 2.0 * score))
+            for i, score in zip(ids, scores[positions])
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4,
+                                                          filter: dict | None = None) -> list[tuple[Document, float]]:
+        rows = self._rows(filter)
+        return self._top_k(self._scores([embedding], rows)[0], k, rows)
+
+    def search_by_vectors(self, query_vectors, k: int = 4, filter: dict | None = None) -> list[list[tuple[Document, float]]]:
+        """多个查询向量共用每个块的升精度结果"""
+        rows = self._rows(filter)
+        return [self._top_k(scores, k, rows) for scores in self._scores(query_vectors, rows)]
+
+    def get(self, include: list[str] | None = None) -> dict:
+        """与 Chroma.get 的返回结构一致，供 BM25 索引等复用同一批 chunk"""
+        return {"documents": list(self.texts), "metadatas": [dict(m) for m in self.metadatas]}
@@ -0,0 +1,28 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+api = pytest.importorskip("api", exc_type=ImportError)
+
+class FakeLLM:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    async def ainvoke(self, prompt):
+        self.calls.append(prompt)
+        if self.fail:
+            raise ConnectionError("backend down")
+        return "pong"
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_warm_up_pings_llm_once_after_ready(monkeypatch, fail):
+    llm = FakeLLM(fail)
+    monkeypatch.setattr(api, "warmup_ecu_agent", lambda *args, **kwargs: {"graph": {"ok": True}})
+    monkeypatch.setattr(api, "get_llm", lambda: llm)
+    app = SimpleNamespace(state=SimpleNamespace(ready=False, warmup={}))
+
+    asyncio.run(api._warm_up(app))
+
+    assert app.state.ready
+    assert llm.calls == ["ping"]
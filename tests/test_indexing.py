@@ -0,0 +1,107 @@
+import pytest
+import config
+from indexing import MANIFEST_VERSION, load_manifest, plan_sync, save_manifest, source_key, sync_index
+
+class FakeVectorStore:
+    """只记录写入和删除的 id，代替真实向量库"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def add_documents(self, docs, ids):
+        self.docs.update(zip(ids, docs))
+
+    def delete(self, ids):
+        for cid in ids:
+            self.docs.pop(cid)
+
+MANUAL_A = """# Manual
+## ECU-1
+| Parameter | Value |
+|---|---|
+| **CPU** | 1 GHz |
+| **RAM** | 1 GB |
+"""
+
+@pytest.fixture
+def manuals(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    a = data / "a.md"
+    b = data / "b.md"
+    a.write_text(MANUAL_A, encoding="utf-8")
+    b.write_text("# Manual\n## ECU-2\nPlain text section.\n", encoding="utf-8")
+    persist = tmp_path / "index"
+    persist.mkdir()
+    return {a: "A", b: "B"}, persist
+
+def _manifest(sources, **overrides):
+    manifest = {"version": MANIFEST_VERSION, "embedding_model": config.EMBED_MODEL_ID, "sources": sources}
+    manifest.update(overrides)
+    return manifest
+
+@pytest.mark.parametrize("case, rebuild, changed, removed", [
+    ("no_manifest", True, ["a", "b"], []),
+    ("other_model", True, ["a", "b"], []),
+    ("unchanged", False, [], []),
+    ("a_edited", False, ["a"], []),
+    ("c_deleted", False, [], ["c"]),
+])
+def test_plan_sync(manuals, case, rebuild, changed, removed):
+    sources, _ = manuals
+    paths = {p.stem: p for p in sources}
+    current = {key: {"sha256": plan_sync(None, sources)["hashes"][key]}
+               for key in map(source_key, sources)}
+    manifest = {
+        "no_manifest": None,
+        "other_model": _manifest(current, embedding_model="other"),
+        "unchanged": _manifest(current),
+        "a_edited": _manifest({**current, source_key(paths["a"]): {"sha256": "stale"}}),
+        "c_deleted": _manifest({**current, "c.md": {"sha256": "x"}}),
+    }[case]
+
+    plan = plan_sync(manifest, sources)
+    assert plan["rebuild"] == rebuild
+    assert [path.stem for path, _ in plan["changed"]] == changed
+    assert plan["removed"] == (["c.md"] if removed else [])
+
+def test_sync_index_is_incremental(manuals):
+    sources, persist = manuals
+    resets = []
+
+    def reset():
+        resets.append(1)
+        return FakeVectorStore()
+
+    store, changed = sync_index(FakeVectorStore(), persist, sources, reset)
+    assert changed and len(resets) == 1
+    assert len(store.docs) == 3
+    assert {doc.metadata["series"] for doc in store.docs.values()} == {"A", "B"}
+
+    # 未变化：不解析、不写入
+    def fail_parse(jobs):
+        raise AssertionError(f"unexpected parse: {jobs}")
+
+    same, changed = sync_index(store, persist, sources, reset, parse_sources=fail_parse)
+    assert same is store and not changed
+
+    # 修改一行：只替换该行对应的 chunk
+    a = next(p for p in sources if p.stem == "a")
+    before = dict(store.docs)
+    a.write_text(MANUAL_A.replace("1 GB", "2 GB"), encoding="utf-8")
+    store, changed = sync_index(store, persist, sources, reset)
+    assert changed and len(resets) == 1
+    assert len(store.docs) == 3
+    added = [doc.page_content for cid, doc in store.docs.items() if cid not in before]
+    assert len(added) == 1 and added[0].endswith("Parameter:RAM\nValue:2 GB")
+
+    # 删除手册：移除其全部 chunk
+    del sources[a]
+    store, changed = sync_index(store, persist, sources, reset)
+    assert changed
+    assert {doc.metadata["series"] for doc in store.docs.values()} == {"B"}
+    assert list(load_manifest(persist)["sources"]) == [source_key(p) for p in sources]
+
+def test_load_manifest_ignores_other_versions(tmp_path):
+    save_manifest(tmp_path, {"version": MANIFEST_VERSION + 1, "sources": {}})
+    assert load_manifest(tmp_path) is None
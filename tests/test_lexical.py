@@ -0,0 +1,23 @@
+import pytest
+from langchain_core.documents import Document
+
+lexical = pytest.importorskip("lexical", exc_type=ImportError)
+
+DOCS = [
+    Document(page_content="ECU-750 CAN FD single channel 1 Mbps", metadata={"series": "700", "source": "a"}),
+    Document(page_content="ECU-850 CAN FD dual channel 2 Mbps", metadata={"series": "800B", "source": "b"}),
+    Document(page_content="ECU-850b CAN FD dual channel, NPU 5 TOPS", metadata={"series": "800P", "source": "c"}),
+    Document(page_content="ECU-850 storage 16 GB eMMC", metadata={"series": "800B", "source": "d"}),
+]
+
+@pytest.mark.parametrize("series", [None, "700", "800B", "800P", "missing"])
+def test_series_filter_matches_unfiltered_ranking(series):
+    index = lexical.BM25Index(DOCS)
+    everything = index.search("CAN dual channel ECU-850", k=len(DOCS))
+    expected = [d.metadata["source"] for d in everything if series is None or d.metadata["series"] == series]
+    assert [d.metadata["source"] for d in index.search("CAN dual channel ECU-850", k=len(DOCS), series=series)] == expected
+
+def test_search_respects_k_and_skips_zero_scores():
+    index = lexical.BM25Index(DOCS)
+    assert [d.metadata["source"] for d in index.search("eMMC", k=3)] == ["d"]
+    assert len(index.search("CAN", k=2)) == 2
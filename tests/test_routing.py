@@ -0,0 +1,43 @@
+import pytest
+from routing import Router, route
+
+@pytest.mark.parametrize("question, expected", [
+    # data/test-questions.csv
+    ("What is the maximum operating temperature for the ECU-750?", "700"),
+    ("How much RAM does the ECU-850 have?", "800B"),
+    ("What are the AI capabilities of the ECU-850b?", "800P"),
+    ("What are the differences between ECU-850 and ECU-850b?", "multi:800B,800P"),
+    ("Compare the CAN bus capabilities of ECU-750 and ECU-850.", "multi:700,800B"),
+    ("What is the power consumption of the ECU-850b under load?", "800P"),
+    ("Which ECU models support Over-the-Air (OTA) updates?", "multi:700,800B,800P"),
+    ("How does the storage capacity compare across all ECU models?", "multi:700,800B,800P"),
+    ("Which ECU can operate in the harshest temperature conditions?", "multi:700,800B,800P"),
+    ("How do you enable the NPU on the ECU-850b?", "800P"),
+    # 别名、大小写和标点
+    ("What about the 800 plus?", "800P"),
+    ("Is the ECU-850B rated for +105°C?", "800P"),
+    ("Does the legacy unit support OTA?", "700"),
+    ("What is the maximum operating temperature for the ECU-800b?", "800B"),
+    ("What is the RAM of the ECU-800B?", "800B"),
+    ("Compare 800B and 800P", "multi:800B,800P"),
+    ("ECU-750 vs ECU-850", "multi:700,800B"),
+    ("Compare ECU-850 and ECU-850b and ECU-750", "multi:700,800B,800P"),
+    # 多个系列但无比较意图：按表中顺序取第一个
+    ("ECU-850 ECU-750 pinout", "700"),
+    ("Tell me about the weather", "unknown"),
+])
+def test_route(question, expected):
+    result, _ = route(question)
+    assert result == expected
+
+@pytest.mark.parametrize("question, expected", [
+    ("Specs of the X-1?", "X"),
+    ("Specs of the X-10?", "X10"),
+    ("Specs of the X-100?", "unknown"),
+    ("Difference between X-1 and X-10", "multi:X,X10"),
+    ("Which model is fastest?", "multi:X,X10"),
+])
+def test_custom_table_prefers_longest_alias(question, expected):
+    router = Router({"X": ["x-1"], "X10": ["x-10"]}, {"comparison": ["difference"], "general": ["which"]})
+    result, _ = router.route(question)
+    assert result == expected
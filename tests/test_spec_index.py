@@ -0,0 +1,42 @@
+import pytest
+import config
+from indexing import discover_manuals
+from spec_index import SpecIndex
+
+@pytest.fixture(scope="module")
+def spec_index():
+    return SpecIndex.from_manuals(discover_manuals(config.DATA_DIR))
+
+@pytest.mark.parametrize("question, model, parameter", [
+    ("What is the maximum operating temperature for the ECU-750?", "ECU-750", "Operating Temperature"),
+    ("How much RAM does the ECU-850 have?", "ECU-850", "Memory (RAM)"),
+    ("What is the power consumption of the ECU-850b under load?", "ECU-850b", "Power Consumption"),
+    ("What is the CAN interface of the ECU-750?", "ECU-750", "CAN Interface"),
+    ("What's the CAN bus of the ECU-850?", "ECU-850", "CAN Interface"),
+    ("What processor does the ECU-850 use?", "ECU-850", "Processor"),
+    ("What is the ECU-850b's NPU?", "ECU-850b", "NPU"),
+])
+def test_lookup_answers_spec_questions(spec_index, question, model, parameter):
+    entry = spec_index.lookup(question)
+    assert entry is not None
+    assert entry["model"] == model
+    assert entry["parameter"] == parameter
+
+@pytest.mark.parametrize("question", [
+    # 含型号和参数词，但不是规格查询
+    "Can the ECU-850 run Docker?",
+    "Can the ECU-750 be updated over the air?",
+    "What flash tool should I use for the ECU-750?",
+    "What temperature sensor does the ECU-850 use?",
+    "Is the ECU-750 CPU fast enough for video?",
+    "Will the ECU-850b power up without a battery?",
+    # 比较和操作类问题
+    "How much RAM does the ECU-850 and ECU-850b have?",
+    "Compare the CAN bus capabilities of ECU-750 and ECU-850.",
+    "How do you enable the NPU on the ECU-850b?",
+    # 没有型号或参数
+    "What is the RAM?",
+    "What is the ECU-850?",
+])
+def test_lookup_rejects_non_lookup_questions(spec_index, question):
+    assert spec_index.lookup(question) is None
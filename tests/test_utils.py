@@ -0,0 +1,75 @@
+import re
+import pytest
+from langchain_core.documents import Document
+import config
+from utils import TABLE_SEPARATOR, _series_name, iter_docs_from_markdown, load_docs_from_markdown
+
+def reference_docs(file_path: str) -> list[Document]:
+    """原先整文件读入、按标题切分的解析逻辑，作为流式解析的对照"""
+    with open(file_path, encoding="utf-8") as f:
+        content = f.read()
+    series_name = _series_name(file_path)
+    docs = []
+    sections = re.split(r'\n##\s+(.+)', content)
+    for i in range(1, len(sections), 2):
+        title = sections[i].strip()
+        body = sections[i + 1].strip() if i + 1 < len(sections) else ""
+        if not title or "series" in title.lower():
+            continue
+        if "|" in body and "**" in body:
+            table_lines, non_table_lines, in_table = [], [], False
+            for line in body.split("\n"):
+                stripped = line.strip()
+                if stripped.startswith("|") and stripped.endswith("|"):
+                    table_lines.append(stripped)
+                    in_table = True
+                elif in_table and (stripped == "" or all(c in "-| " for c in stripped)):
+                    continue
+                else:
+                    non_table_lines.append(line)
+                    in_table = False
+            data_rows = [row for row in table_lines if not TABLE_SEPARATOR.match(row)]
+            for row in data_rows[1:]:
+                cells = [cell.strip().replace("**", "").strip() for cell in row.split("|")[1:-1]]
+                if len(cells) >= 2 and cells[0] and cells[1]:
+                    docs.append(Document(
+                        page_content=f"Series:{series_name}\nModel:{title}\nParameter:{cells[0]}\nValue:{cells[1]}",
+                        metadata={"source": file_path, "model": title, "parameter": cells[0]}
+                    ))
+            non_table_body = "\n".join(non_table_lines).strip()
+            if non_table_body:
+                docs.append(Document(
+                    page_content=f"Series: {series_name}\nModel: {title}\n\n{non_table_body}",
+                    metadata={"source": file_path, "model": title}
+                ))
+        else:
+            docs.append(Document(
+                page_content=f"Series: {series_name}\nModel: {title}\n\n{body}",
+                metadata={"source": file_path, "model": title}
+            ))
+    return docs
+
+def _dump(docs):
+    return [(doc.page_content, doc.metadata) for doc in docs]
+
+@pytest.mark.parametrize("path", sorted(config.DATA_DIR.glob("*.md")), ids=lambda p: p.name)
+def test_bundled_manuals_match_reference(path):
+    docs = list(iter_docs_from_markdown(str(path)))
+    assert docs
+    assert _dump(docs) == _dump(reference_docs(str(path)))
+    assert _dump(docs) == _dump(load_docs_from_markdown(str(path)))
+
+@pytest.mark.parametrize("name, text", [
+    ("plain", "# Title\nintro\n## Model A\nline 1\n\nline 2\n## Model B\nonly text\n"),
+    ("table", "# T\n## M\nSome text\n| Param | Value |\n|---|---|\n| **CPU** | 1 GHz |\n| **RAM** | |\n\nAfter table\n"),
+    # 加粗标记出现在表格之后：表格行需暂存到判定为表格小节时再产出
+    ("late_bold", "# T\n## M\n| Param | Value |\n|:--|--:|\n| CPU | 1 GHz |\n\nNote: **important**\n"),
+    ("pipe_without_bold", "# T\n## M\n| a | b |\n| c | d |\n"),
+    ("skipped_series_section", "# T\n## ECU Series Overview\n| **x** | y |\n## M\ntext\n"),
+    ("header_only", "# T\n## M\n| **Param** | Value |\n|---|---|\n"),
+    ("empty_section", "# T\n## M\n## N\nbody"),
+])
+def test_edge_cases_match_reference(tmp_path, name, text):
+    path = tmp_path / f"{name}.md"
+    path.write_text(text, encoding="utf-8")
+    assert _dump(iter_docs_from_markdown(str(path))) == _dump(reference_docs(str(path)))